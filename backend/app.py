@@ -1,14 +1,106 @@
+import asyncio
+import hashlib
+import io
 import os
-from typing import Any
-
-from fastapi import FastAPI, HTTPException
+import sys
+import uuid
+import warnings
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from math import isfinite
+from pathlib import Path
+from string import Template
+from typing import Any, Sequence
+
+import httpx
+import numpy as np
+import orjson
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from llm_cache import DiskCache, InMemoryTTLCache
+
+try:  # Redis 为可选依赖：没装/没配 REDIS_URL 时自动退化为不缓存
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None
+
+if sys.platform != "win32":  # uvloop 对大量小 send() 的 SSE 场景提升明显
+    try:
+        import uvloop
+
+        uvloop.install()
+    except ImportError:  # pragma: no cover
+        pass
+
 
+# 非流式响应统一走 orjson（跳过 jsonable_encoder 的纯 Python 遍历）
+app = FastAPI(default_response_class=ORJSONResponse)
 
-app = FastAPI()
+# 共享的连接池：避免每个请求重建 TCP+TLS（握手 ~150-300ms），SSE 并发时尤其重要
+_http = httpx.AsyncClient(
+    limits=httpx.Limits(max_keepalive_connections=50, max_connections=200, keepalive_expiry=30),
+    timeout=httpx.Timeout(60.0, connect=10.0),
+)
+
+@lru_cache(maxsize=8)
+def _get_client(api_key: str, base_url: str) -> AsyncOpenAI:
+    # 按 (api_key, base_url) 复用客户端：SDK 客户端自带状态，重建会丢掉会话复用；
+    # 连接池统一挂在 _http 上，多个客户端也只有一套 keepalive 连接
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=_http)
+
+
+_REDIS_URL = os.environ.get("REDIS_URL")
+_redis = aioredis.from_url(_REDIS_URL, decode_responses=False) if (aioredis and _REDIS_URL) else None
+# LLM 输出按月更新即可，默认缓存 1 天
+_LLM_CACHE_TTL = int(os.environ.get("OPENPULSE_LLM_CACHE_TTL", "86400"))
+# 一级内存缓存：热 key 连 Redis 往返都省掉；没配 Redis 时也有缓存可用
+_llm_mem_cache = InMemoryTTLCache(maxsize=1024, ttl=min(_LLM_CACHE_TTL, 3600))
+# 磁盘三级缓存：重启后首个请求也温热，多 worker 共享；置空环境变量即关闭
+_LLM_DISK_CACHE_DIR = os.environ.get("OPENPULSE_LLM_CACHE_DIR", "/tmp/openpulse_llm_cache")
+_llm_disk_cache = DiskCache(Path(_LLM_DISK_CACHE_DIR)) if _LLM_DISK_CACHE_DIR else None
+
+# LLM 并发闸门：突发流量下保护共享连接池与上游 RPM/TPM 限额
+_llm_sem = asyncio.Semaphore(int(os.environ.get("OPENAI_MAX_CONCURRENCY", "32")))
+
+
+# 只重试瞬态错误（429/5xx/超时/断连）；4xx 一类的请求错误重试没有意义
+_RETRYABLE_LLM_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+@retry(
+    retry=retry_if_exception_type(_RETRYABLE_LLM_ERRORS),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(4),
+    reraise=True,
+)
+async def _chat_create(**kwargs: Any):
+    # 所有 LLM 调用统一过闸门；流式调用只闸建连，不占用 token 下发阶段。
+    # 重试包在闸门外层：退避等待期间不占并发额度；流式只重试建连，不会重放已消费的流
+    client = _get_client(
+        os.environ.get("OPENAI_API_KEY", ""),
+        os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    )
+    async with _llm_sem:
+        return await client.chat.completions.create(**kwargs)
+
+
+@app.on_event("shutdown")
+async def _close_http() -> None:
+    await _http.aclose()
+    if _redis is not None:
+        await _redis.aclose()
 
 # 允许前端本地开发直接访问（Vite 默认 5173）
 app.add_middleware(
@@ -24,6 +116,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 让浏览器侧代码能读到 ETag，用于条件请求
+    expose_headers=["ETag"],
 )
 
 
@@ -48,19 +142,61 @@ class IntroReq(BaseModel):
     latest: dict[str, Any] | None = None
 
 
-def _num(x: Any) -> float | None:
-    if isinstance(x, (int, float)) and not isinstance(x, bool):
-        if x != x:  # NaN
-            return None
-        return float(x)
+def _dumps(o: Any) -> str:
+    # prompt/SSE 统一嵌 JSON：orjson 比 dict.__repr__ 快一个量级，模型解析也更稳
+    return orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _llm_cache_key(model: str, prompt: str) -> bytes:
+    return b"llm:" + hashlib.sha256(f"{model}|{prompt}".encode("utf-8")).digest()
+
+
+async def _llm_cache_get(key: bytes) -> Any | None:
+    cached = _llm_mem_cache.get(key)
+    if cached is not None:
+        return cached
+    if _redis is not None:
+        try:
+            raw = await _redis.get(key)
+        except Exception:
+            # 缓存不可用不影响主链路
+            raw = None
+        if raw:
+            payload = orjson.loads(raw)
+            # Redis 命中回填内存层，后续同 key 请求零往返
+            _llm_mem_cache.set(key, payload)
+            return payload
+    if _llm_disk_cache is not None:
+        raw = _llm_disk_cache.get(key)
+        if raw:
+            payload = orjson.loads(raw)
+            _llm_mem_cache.set(key, payload)
+            return payload
     return None
 
 
-def _avg(vals: list[float | None]) -> float | None:
-    v = [x for x in vals if x is not None]
-    if not v:
+async def _llm_cache_set(key: bytes, payload: Any) -> None:
+    _llm_mem_cache.set(key, payload)
+    raw = orjson.dumps(payload)
+    if _llm_disk_cache is not None:
+        _llm_disk_cache.set(key, raw)
+    if _redis is None:
+        return
+    try:
+        await _redis.set(key, raw, ex=_LLM_CACHE_TTL)
+    except Exception:
+        pass
+
+
+def _num(x: Any) -> float | None:
+    # 热路径（对比矩阵里每个格子都会调）：一次 float() + isfinite 替代 isinstance 链
+    if isinstance(x, bool):
         return None
-    return sum(v) / len(v)
+    try:
+        f = float(x)
+    except (TypeError, ValueError):
+        return None
+    return f if isfinite(f) else None
 
 
 def _pct_change(now: float | None, prev: float | None) -> float | None:
@@ -89,7 +225,7 @@ def _series_metric(row: dict[str, Any], key: str, fallback_key: str | None = Non
 
 def _compute_time_window_comparisons(
     series: list[dict[str, Any]] | None,
-    metrics: list[tuple[str, str, str | None]],
+    metrics: Sequence[tuple[str, str, str | None]],
 ) -> dict[str, Any]:
     """
     复用前端 riskRules 的口径：
@@ -103,17 +239,39 @@ def _compute_time_window_comparisons(
         return {"available": False, "last_month": (s6[-1].get("month") if s6 else None), "items": []}
 
     last_month = s6[-1].get("month")
-    last1 = s6[-1:]
-    prev3 = s6[-4:-1]  # 3 months before last1
-    last3 = s6[-3:]
-    prev3_before_last3 = s6[:3] if len(s6) >= 6 else []
+
+    # 一次性构建 [月份 × 指标] 矩阵（缺失填 NaN），四个窗口均值全部走 nanmean 切片
+    n = len(metrics)
+    arr = np.array(
+        [
+            [
+                v if (v := _series_metric(d, key, fallback)) is not None else np.nan
+                for _, key, fallback in metrics
+            ]
+            for d in s6
+        ],
+        dtype=np.float64,
+    )
+
+    def _col(x: np.ndarray, i: int) -> float | None:
+        v = x[i]
+        return float(v) if np.isfinite(v) else None
+
+    # 全 NaN 的窗口 nanmean 会经 warnings 模块发 "Mean of empty slice"（errstate
+    # 管不到它），这里按窗口静默掉，结果照旧是 NaN → None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        last1_a = arr[-1]
+        prev3_a = np.nanmean(arr[-4:-1], axis=0)
+        last3_a = np.nanmean(arr[-3:], axis=0)
+        prev3b_a = np.nanmean(arr[:3], axis=0) if len(s6) >= 6 else np.full(n, np.nan)
 
     items: list[dict[str, Any]] = []
-    for label, key, fallback in metrics:
-        last1_v = _avg([_series_metric(d, key, fallback) for d in last1])
-        prev3_v = _avg([_series_metric(d, key, fallback) for d in prev3])
-        last3_v = _avg([_series_metric(d, key, fallback) for d in last3])
-        prev3b_v = _avg([_series_metric(d, key, fallback) for d in prev3_before_last3]) if prev3_before_last3 else None
+    for i, (label, key, fallback) in enumerate(metrics):
+        last1_v = _col(last1_a, i)
+        prev3_v = _col(prev3_a, i)
+        last3_v = _col(last3_a, i)
+        prev3b_v = _col(prev3b_a, i)
         items.append(
             {
                 "label": label,
@@ -129,6 +287,54 @@ def _compute_time_window_comparisons(
     return {"available": True, "last_month": last_month, "items": items}
 
 
+# 对比结果缓存：同一 (repo, month, series) 的 dashboard 重复加载直接复用，避免重复扫 series
+_COMPARISONS_CACHE: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
+_COMPARISONS_CACHE_MAX = 512
+
+
+def _series_hash(series: list[dict[str, Any]] | None) -> int:
+    return hash(tuple((d.get("month"), tuple(sorted(d.items()))) for d in (series or [])))
+
+
+def _comparisons_cached(
+    repo_name: str,
+    month: str | None,
+    series: list[dict[str, Any]] | None,
+    metrics: Sequence[tuple[str, str, str | None]],
+) -> dict[str, Any]:
+    try:
+        key = (repo_name, month, _series_hash(series), tuple(k for _, k, _fb in metrics))
+    except TypeError:
+        # series 里有不可哈希的值：直接计算，不缓存
+        return _compute_time_window_comparisons(series, metrics)
+    hit = _COMPARISONS_CACHE.get(key)
+    if hit is not None:
+        _COMPARISONS_CACHE.move_to_end(key)
+        return hit
+    out = _compute_time_window_comparisons(series, metrics)
+    _COMPARISONS_CACHE[key] = out
+    while len(_COMPARISONS_CACHE) > _COMPARISONS_CACHE_MAX:
+        _COMPARISONS_CACHE.popitem(last=False)
+    return out
+
+
+# 预警/报告的对比指标集：模块级常量，省去每请求重建列表，也让缓存 key 稳定
+_ALERTS_METRICS: tuple[tuple[str, str, str | None], ...] = (
+    ("Activity", "kpi_activity", None),
+    ("New PRs / mo", "kpi_new_prs_month", "kpi_new_prs_month_log"),
+    ("New Issues / mo", "kpi_new_issues_month", "kpi_new_issues_month_log"),
+    ("PR Response Median (h)", "lat_pr_response_median", None),
+    ("PR Resolution Median (h)", "lat_pr_resolution_median", None),
+    ("Issue Response Median (h)", "lat_issue_response_median", None),
+    ("Bus Factor", "bus_factor", None),
+    ("Active Contributors / mo", "kpi_active_contributors_month", None),
+)
+_REPORT_METRICS: tuple[tuple[str, str, str | None], ...] = _ALERTS_METRICS + (
+    ("Stars Δ / mo", "kpi_stars_delta_month", None),
+    ("OpenRank", "kpi_openrank", None),
+)
+
+
 class StructuredAlertAction(BaseModel):
     owner: str
     cadence: str
@@ -202,69 +408,66 @@ class IntroV2Resp(BaseModel):
 
 
 def _render_alerts_v2_markdown(obj: AlertsV2Resp) -> str:
+    # 兜底路径上同步跑在事件循环里：用 StringIO 单缓冲直写，替代 list.append + join
     def pct(p: float | None) -> str:
         if p is None:
             return "—"
         return f"{p * 100:.0f}%"
 
-    lines: list[str] = []
-    lines.append("## 近期预警与建议（结构化）")
-    lines.append(f"- **摘要**：{obj.summary}")
+    buf = io.StringIO()
+    w = buf.write
+    w("## 近期预警与建议（结构化）\n")
+    w(f"- **摘要**：{obj.summary}\n")
     if obj.next_metrics:
-        lines.append(f"- **下一步关注指标**：{', '.join(obj.next_metrics)}")
-    lines.append("")
+        w(f"- **下一步关注指标**：{', '.join(obj.next_metrics)}\n")
+    w("\n")
     if obj.comparisons.get("available"):
-        lines.append("## 时间窗口对比（口径：last1 vs prev3、last3 vs prev3）")
+        w("## 时间窗口对比（口径：last1 vs prev3、last3 vs prev3）\n")
         for it in obj.comparisons.get("items", [])[:8]:
-            lines.append(
+            w(
                 f"- **{it.get('label')}**："
                 f"last1={it.get('last1')}, prev3_avg={it.get('prev3_avg')}（{pct(it.get('last1_vs_prev3_pct'))}）"
-                f"；last3_avg={it.get('last3_avg')}, prev3_before_last3_avg={it.get('prev3_before_last3_avg')}（{pct(it.get('last3_vs_prev3_pct'))}）"
+                f"；last3_avg={it.get('last3_avg')}, prev3_before_last3_avg={it.get('prev3_before_last3_avg')}（{pct(it.get('last3_vs_prev3_pct'))}）\n"
             )
-        lines.append("")
+        w("\n")
     if obj.why_triggered:
-        lines.append("## 为什么触发")
+        w("## 为什么触发\n")
         for s in obj.why_triggered:
-            lines.append(f"- {s}")
-        lines.append("")
+            w(f"- {s}\n")
+        w("\n")
     if obj.why_not_triggered:
-        lines.append("## 为什么没触发（或未观察到）")
+        w("## 为什么没触发（或未观察到）\n")
         for s in obj.why_not_triggered:
-            lines.append(f"- {s}")
-        lines.append("")
+            w(f"- {s}\n")
+        w("\n")
     if obj.risks:
-        lines.append("## 风险清单与行动建议")
+        w("## 风险清单与行动建议\n")
         for r in obj.risks:
-            lines.append(f"### [{r.level.upper()}] {r.title}")
-            lines.append(f"- **风险点**：{r.risk}")
-            lines.append(f"- **影响**：{r.impact}")
+            w(f"### [{r.level.upper()}] {r.title}\n")
+            w(f"- **风险点**：{r.risk}\n")
+            w(f"- **影响**：{r.impact}\n")
             if r.evidence:
-                lines.append("- **证据**：")
+                w("- **证据**：\n")
                 for e in r.evidence:
-                    lines.append(f"  - {e}")
+                    w(f"  - {e}\n")
             if r.actions:
-                lines.append("- **建议动作（可执行）**：")
+                w("- **建议动作（可执行）**：\n")
                 for a in r.actions:
-                    lines.append(f"  - **负责人**：{a.owner}；**节奏**：{a.cadence}；**SLA**：{a.sla}；**成功判据**：{a.success}")
-            lines.append("")
-    return "\n".join(lines).strip()
+                    w(f"  - **负责人**：{a.owner}；**节奏**：{a.cadence}；**SLA**：{a.sla}；**成功判据**：{a.success}\n")
+            w("\n")
+    return buf.getvalue().strip()
 
 
-def _fallback_alerts_v2(req: AlertsV2Req) -> AlertsV2Resp:
+def _fallback_alerts_v2(req: AlertsV2Req, comparisons: dict[str, Any] | None = None) -> AlertsV2Resp:
     # 兜底：用规则告警 + 时间窗口对比生成“可读且结构化”的内容（不依赖外部事实）
-    comparisons = _compute_time_window_comparisons(
-        req.series,
-        metrics=[
-            ("Activity", "kpi_activity", None),
-            ("New PRs / mo", "kpi_new_prs_month", "kpi_new_prs_month_log"),
-            ("New Issues / mo", "kpi_new_issues_month", "kpi_new_issues_month_log"),
-            ("PR Response Median (h)", "lat_pr_response_median", None),
-            ("PR Resolution Median (h)", "lat_pr_resolution_median", None),
-            ("Issue Response Median (h)", "lat_issue_response_median", None),
-            ("Bus Factor", "bus_factor", None),
-            ("Active Contributors / mo", "kpi_active_contributors_month", None),
-        ],
-    )
+    # 调用方已经算过 comparisons 时直接传入，避免兜底路径再扫一遍 series
+    if comparisons is None:
+        comparisons = _comparisons_cached(
+            req.repo_name,
+            req.month,
+            req.series,
+            metrics=_ALERTS_METRICS,
+        )
 
     ra = req.rule_alerts or []
     risks: list[StructuredAlertRisk] = []
@@ -322,37 +525,18 @@ def _fallback_alerts_v2(req: AlertsV2Req) -> AlertsV2Resp:
     )
 
 
-def _sse_event(data: str, event: str = "message") -> str:
-    # SSE 格式：event + data（data 可多行）
-    data = (data or "").replace("\r\n", "\n").replace("\r", "\n")
-    lines = [f"event: {event}"]
-    for ln in data.split("\n"):
-        lines.append(f"data: {ln}")
-    lines.append("")  # end of event
-    return "\n".join(lines) + "\n"
-
-
-@app.post("/api/report")
-async def gen_report(req: ReportReq):
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="Missing OPENAI_API_KEY env var")
-
-    client = OpenAI(
-        api_key=api_key,
-        base_url=os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-    )
-
-    prompt = f"""
+# 提示词模板：请求间完全复用静态骨架，并统一预先 strip。
+# v1 端点用 string.Template（骨架只解析一次，substitute 单趟替换占位符）
+_REPORT_PROMPT_TPL = Template("""
 你是开源项目治理分析专家。请基于以下项目数据生成一份“项目健康分析报告”。
 **输出必须为 Markdown**（使用 `##`/`###` 标题与列表），排版要适合大屏弹窗阅读；不要输出代码块；不要编造具体事实。
 
 【项目】
-- repo_name: {req.repo_name}
-- month: {req.month}
+- repo_name: ${repo_name}
+- month: ${month}
 
 【关键指标（可能为空）】
-{req.latest}
+${latest}
 
 请按以下结构输出：
 ## 项目健康分析报告
@@ -373,11 +557,292 @@ async def gen_report(req: ReportReq):
 （1-2 句）
 
 请避免输出任何敏感信息。
+""".strip())
+
+_ALERTS_PROMPT_TPL = Template("""
+你是开源项目治理风险预警分析助手。请基于以下输入，生成 3~5 条“近期预警”与建议。
+**输出必须为 Markdown**，以 `## 近期预警与建议` 开头，随后用列表输出；不要输出代码块；不要编造具体事实。
+
+【项目】
+- repo_name: ${repo_name}
+- month: ${month}
+
+【规则告警（优先参考，可解释、可信）】
+${rule_alerts}
+
+【近期指标序列（可能为空）】
+${series}
+
+【latest（可能为空）】
+${latest}
+
+输出要求：
+1) 每条包含：**风险点** + **影响** + **建议（可执行）**
+2) 优先覆盖规则告警中 `level=high/medium` 的项
+3) 信息不足时用“可能/建议进一步确认”表达
+""".strip())
+
+_INTRO_PROMPT_TPL = Template("""
+你是开源项目大屏展示的文案助手。请为该仓库生成一段“简短项目简介”，用于大屏弹窗展示：
+
+【项目】
+- repo_name: ${repo_name}
+- month: ${month}
+
+【元数据（可能为空）】
+${meta}
+
+【关键指标（可能为空）】
+${latest}
+
+要求：
+1) 中文输出，2~4 句，总字数控制在 60~120 字
+2) 不要编造具体事实（如用户数/公司/下载量等）；只做可能性的描述
+3) 语气专业、克制、适合大屏
+""".strip())
+
+# v2 模板：.format 只替换占位符
+_ALERTS_V2_PROMPT_TPL = """
+你是开源项目治理风险预警分析助手。请基于提供的数据，输出一个“结构化 JSON”，供前端做卡片化展示。
+要求：
+1) 必须中文输出（除 metric 名可保留原字段名）。
+2) 不得编造外部事实；数值只能引用输入中给出的 comparisons 或 latest/series。
+3) 必须包含：时间窗口对比（last1 vs prev3、last3 vs prev3）、为什么触发/为什么没触发、具体行动建议（负责人/节奏/SLA/成功判据）、最后给 3 个“下一步关注指标”。
+4) 只输出 JSON，不要 Markdown，不要代码块。
+
+【项目】
+- repo_name: {repo_name}
+- month: {month}
+
+【规则告警（优先参考，可解释、可信）】
+{rule_alerts}
+
+【时间窗口对比（已由系统计算，允许引用；禁止编造）】
+{comparisons}
+
+【latest（可能为空）】
+{latest}
+
+JSON Schema（字段必须齐全）：
+{{
+  "schema": "openpulse.alerts.v2",
+  "repo_name": "...",
+  "month": "...",
+  "summary": "1-2 句摘要（适合大屏）",
+  "next_metrics": ["metric_a","metric_b","metric_c"],
+  "comparisons": <原样透传 comparisons>,
+  "why_triggered": ["...","..."],
+  "why_not_triggered": ["...","..."],
+  "risks": [
+    {{
+      "id": "rule_id_or_custom",
+      "level": "high|medium|low",
+      "title": "短标题",
+      "risk": "风险点（具体）",
+      "impact": "影响（具体）",
+      "evidence": ["证据1（含指标名/变化口径）", "证据2..."],
+      "actions": [
+        {{"owner":"负责人角色","cadence":"节奏/频率","sla":"SLA/时限","success":"成功判据（可量化）"}}
+      ]
+    }}
+  ]
+}}
 """.strip()
 
+_ALERTS_V2_STREAM_PROMPT_TPL = """
+你是开源项目治理风险预警分析助手。请基于提供的数据，输出一个“结构化 JSON”，供前端做卡片化展示。
+要求：中文输出；不得编造外部事实；数值只能引用输入中的 comparisons/latest/series；只输出 JSON（不要 Markdown/代码块）。
+必须包含：时间窗口对比、为什么触发/为什么没触发、具体行动建议（负责人/节奏/SLA/成功判据）、下一步关注指标（3 个）。
+
+【项目】repo_name={repo_name} month={month}
+【规则告警】{rule_alerts}
+【时间窗口对比】{comparisons}
+【latest】{latest}
+
+JSON Schema（字段必须齐全）：
+{{
+  "schema":"openpulse.alerts.v2",
+  "repo_name":"...",
+  "month":"...",
+  "summary":"...",
+  "next_metrics":["...","...","..."],
+  "comparisons": {comparisons},
+  "why_triggered":["..."],
+  "why_not_triggered":["..."],
+  "risks":[
+    {{"id":"...","level":"high|medium|low","title":"...","risk":"...","impact":"...","evidence":["..."],"actions":[{{"owner":"...","cadence":"...","sla":"...","success":"..."}}]}}
+  ]
+}}
+""".strip()
+
+_REPORT_V2_STREAM_PROMPT_TPL = """
+你是开源项目治理分析专家。请基于输入数据生成一份“结构化 JSON 报告”，用于前端大屏弹窗卡片化渲染。
+要求：
+1) 中文输出；不得编造外部事实；数值只能引用输入中的 comparisons/latest/series。
+2) 必须包含：Executive Summary（3-5 条）、风险项（含证据与行动）、治理行动清单（负责人/节奏/SLA/成功判据）、下一步关注指标（3 个）。
+3) 只输出 JSON（不要 Markdown/代码块）。
+
+【项目】repo_name={repo_name} month={month}
+【meta】{meta}
+【latest】{latest}
+【规则告警】{rule_alerts}
+【时间窗口对比】{comparisons}
+
+JSON Schema（字段必须齐全）：
+{{
+  "schema":"openpulse.report.v2",
+  "repo_name":"...",
+  "month":"...",
+  "title":"...",
+  "executive_summary":["...","...","..."],
+  "comparisons": {comparisons},
+  "risks":[
+    {{"id":"...","level":"high|medium|low","title":"...","risk":"...","impact":"...","evidence":["..."],"actions":[{{"owner":"...","cadence":"...","sla":"...","success":"..."}}]}}
+  ],
+  "governance_actions":[{{"owner":"...","cadence":"...","sla":"...","success":"..."}}],
+  "next_metrics":["...","...","..."]
+}}
+""".strip()
+
+_INTRO_V2_STREAM_PROMPT_TPL = """
+你是开源项目大屏展示的文案助手。请生成“结构化 JSON”，只包含一个 intro 字段（中文 60~120 字，2~4 句），用于弹窗展示。
+不得编造外部事实；只做可能性描述；只输出 JSON（不要 Markdown/代码块）。
+
+输入：
+repo_name={repo_name}
+month={month}
+meta={meta}
+latest={latest}
+
+JSON Schema：
+{{"schema":"openpulse.intro.v2","repo_name":"...","month":"...","intro":"..."}}
+""".strip()
+
+
+# 常用事件的帧头预编码：单行 delta（LLM token 的常态）直接拼 bytes，免 split/join
+# 长 series 的 prompt 拼接（多次 _dumps + format）可达数毫秒且发生在 await 之前，
+# 超过该阈值就丢到线程，避免拖住同进程里其他正在推送的 SSE 流
+_PROMPT_OFFLOAD_SERIES_LEN = 12
+
+
+def _build_alerts_v2_prompt(tpl: str, req: AlertsV2Req, comparisons: dict[str, Any]) -> str:
+    return tpl.format(
+        repo_name=req.repo_name,
+        month=req.month,
+        rule_alerts=_dumps(req.rule_alerts),
+        comparisons=_dumps(comparisons),
+        latest=_dumps(req.latest),
+    )
+
+
+async def _alerts_v2_prompt(tpl: str, req: AlertsV2Req, comparisons: dict[str, Any]) -> str:
+    if len(req.series or []) > _PROMPT_OFFLOAD_SERIES_LEN:
+        return await asyncio.to_thread(_build_alerts_v2_prompt, tpl, req, comparisons)
+    return _build_alerts_v2_prompt(tpl, req, comparisons)
+
+
+_SSE_PREFIX = {
+    "message": b"event: message\ndata: ",
+    "meta": b"event: meta\ndata: ",
+    "delta": b"event: delta\ndata: ",
+    "done": b"event: done\ndata: ",
+    "error": b"event: error\ndata: ",
+}
+
+
+def _sse_stream_json(full: str, chunk: int = 2048):
+    """兜底/缓存命中时把完整 JSON 切成 delta 流再收一个 done。
+
+    编码一次、memoryview 零拷贝切片（不再每片新建 str）；切点回退到 UTF-8
+    字符边界，避免把中文字符劈到两个事件里。
+    """
+    mv = memoryview(full.encode("utf-8"))
+    total = len(mv)
+    i = 0
+    while i < total:
+        j = min(i + chunk, total)
+        # 不要切在 UTF-8 续字节中间
+        while j < total and (mv[j] & 0xC0) == 0x80:
+            j -= 1
+        yield _SSE_PREFIX["delta"] + bytes(mv[i:j]) + b"\n\n"
+        i = j
+    yield _sse_event(full, event="done")
+
+
+def _sse_event(data: str, event: str = "message") -> bytes:
+    # SSE 格式：event + data（data 可多行）；返回 bytes，Starlette 原样透传不再重编码。
+    # 流式 delta 99% 是单行：`in` 是 C 级单遍扫描，命中快路径时完全不走 split/join
+    raw = (data or "").encode("utf-8")
+    prefix = _SSE_PREFIX.get(event) or (b"event: " + event.encode("utf-8") + b"\ndata: ")
+    if b"\n" not in raw and b"\r" not in raw:
+        return prefix + raw + b"\n\n"
+    # 慢路径：多行 data 需要逐行加 data: 前缀
+    raw = raw.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return prefix + raw.replace(b"\n", b"\ndata: ") + b"\n\n"
+
+
+# meta 帧内容对所有流完全一致：编码一次，每个请求直接复用同一个 bytes 对象
+_SSE_META_FRAME = _sse_event('{"schema":"openpulse.stream.v1"}', event="meta")
+
+
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _sse_response(request: Request, agen) -> StreamingResponse:
+    """SSE 统一出口：客户端声明 Accept-Encoding: gzip 时做流式压缩。
+
+    中文 Markdown/JSON 每个字 3 字节，level 1 就能压 3~4 倍；每帧跟一个
+    Z_SYNC_FLUSH 保证增量立即可见。GZipMiddleware 会整段缓冲，对 SSE 不适用，
+    所以这里手动包一层 zlib（wbits=31 即 gzip 封装）。
+    """
+    headers = _SSE_HEADERS
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        comp = zlib.compressobj(1, zlib.DEFLATED, 31)
+
+        async def _gz(inner=agen):
+            async for chunk in inner:
+                out = comp.compress(chunk) + comp.flush(zlib.Z_SYNC_FLUSH)
+                if out:
+                    yield out
+            tail = comp.flush()
+            if tail:
+                yield tail
+
+        agen = _gz()
+        headers = {**_SSE_HEADERS, "Content-Encoding": "gzip"}
+    return StreamingResponse(agen, media_type="text/event-stream", headers=headers)
+
+
+def _require_api_key() -> str:
+    # 报告没有离线兜底，缺 key 直接 500；有兜底的端点自行判断 key 是否存在
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Missing OPENAI_API_KEY env var")
+    return api_key
+
+
+async def _gen_report(req: ReportReq) -> dict[str, Any]:
+    _require_api_key()
+
+    prompt = _REPORT_PROMPT_TPL.substitute(
+        repo_name=req.repo_name,
+        month=req.month,
+        latest=_dumps(req.latest),
+    )
+
+    model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    cache_key = _llm_cache_key(model, prompt)
+    cached = await _llm_cache_get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        resp = client.chat.completions.create(
-            model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+        resp = await _chat_create(
+            model=model,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt},
@@ -388,7 +853,92 @@ async def gen_report(req: ReportReq):
         raise HTTPException(status_code=502, detail=f"Upstream LLM error: {type(e).__name__}: {e}")
 
     text = (resp.choices[0].message.content or "").strip()
-    return {"report": text}
+    payload = {"report": text}
+    await _llm_cache_set(cache_key, payload)
+    return payload
+
+
+def _etag_response(request: Request, payload: Any) -> Response:
+    """带 ETag + 短 Cache-Control 的 JSON 响应；If-None-Match 命中直接 304。
+
+    LLM 输出按 (repo, month) 基本确定：浏览器/边缘缓存一分钟内的重复点击
+    连后端都不用到，配合 stale-while-revalidate 平滑过期。
+    """
+    raw = orjson.dumps(payload)
+    etag = '"' + hashlib.sha256(raw).hexdigest()[:16] + '"'
+    headers = {
+        "Cache-Control": "public, max-age=60, stale-while-revalidate=300",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=raw, media_type="application/json", headers=headers)
+
+
+@app.post("/api/report")
+async def gen_report(req: ReportReq, request: Request):
+    # 直接返回 Response：跳过 jsonable_encoder 的递归遍历，orjson 一次编码完
+    return _etag_response(request, await _gen_report(req))
+
+
+# 异步报告任务：LLM 尾延迟可达 30s，不适合一直占着请求；先发 job_id，结果后台写回
+_REPORT_JOBS: OrderedDict[str, dict[str, Any]] = OrderedDict()
+_REPORT_JOBS_MAX = 256
+_REPORT_JOB_TTL = int(os.environ.get("OPENPULSE_REPORT_JOB_TTL", "3600"))
+
+
+def _report_job_key(job_id: str) -> bytes:
+    return b"report:" + job_id.encode("utf-8")
+
+
+async def _report_job_set(job_id: str, record: dict[str, Any]) -> None:
+    if _redis is not None:
+        try:
+            await _redis.set(_report_job_key(job_id), orjson.dumps(record), ex=_REPORT_JOB_TTL)
+            return
+        except Exception:
+            pass  # Redis 不可用时退化为进程内存储
+    _REPORT_JOBS[job_id] = record
+    _REPORT_JOBS.move_to_end(job_id)
+    while len(_REPORT_JOBS) > _REPORT_JOBS_MAX:
+        _REPORT_JOBS.popitem(last=False)
+
+
+async def _report_job_get(job_id: str) -> dict[str, Any] | None:
+    if _redis is not None:
+        try:
+            raw = await _redis.get(_report_job_key(job_id))
+            if raw:
+                return orjson.loads(raw)
+        except Exception:
+            pass
+    return _REPORT_JOBS.get(job_id)
+
+
+async def _run_report_job(job_id: str, req: ReportReq) -> None:
+    try:
+        payload = await _gen_report(req)
+        await _report_job_set(job_id, {"status": "done", **payload})
+    except HTTPException as e:
+        await _report_job_set(job_id, {"status": "error", "detail": e.detail})
+    except Exception as e:  # 后台任务没有请求上下文，异常必须落到任务记录里
+        await _report_job_set(job_id, {"status": "error", "detail": f"{type(e).__name__}: {e}"})
+
+
+@app.post("/api/report/async", status_code=202)
+async def gen_report_async(req: ReportReq, background: BackgroundTasks):
+    job_id = uuid.uuid4().hex
+    await _report_job_set(job_id, {"status": "pending"})
+    background.add_task(_run_report_job, job_id, req)
+    return {"job_id": job_id}
+
+
+@app.get("/api/report/result/{job_id}")
+async def gen_report_result(job_id: str):
+    record = await _report_job_get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job_id")
+    return record
 
 
 def _fallback_alert_summary(req: AlertsReq) -> str:
@@ -419,44 +969,33 @@ def _fallback_alert_summary(req: AlertsReq) -> str:
     return "## 近期预警与建议\n" + "\n".join(lines + tail)
 
 
-@app.post("/api/alerts")
-async def gen_alerts(req: AlertsReq):
+async def _gen_alerts(req: AlertsReq) -> dict[str, Any]:
     api_key = os.environ.get("OPENAI_API_KEY")
     # 没有 key 也要可用：直接返回兜底摘要（保证离线稳定）
     if not api_key:
         return {"summary": _fallback_alert_summary(req), "mode": "fallback"}
 
-    client = OpenAI(
-        api_key=api_key,
-        base_url=os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-    )
-
-    prompt = f"""
-你是开源项目治理风险预警分析助手。请基于以下输入，生成 3~5 条“近期预警”与建议。
-**输出必须为 Markdown**，以 `## 近期预警与建议` 开头，随后用列表输出；不要输出代码块；不要编造具体事实。
-
-【项目】
-- repo_name: {req.repo_name}
-- month: {req.month}
-
-【规则告警（优先参考，可解释、可信）】
-{req.rule_alerts}
-
-【近期指标序列（可能为空）】
-{req.series}
+    # 既无规则告警也无序列：模型只能复述“暂无告警”，兜底摘要就是这句话
+    if not req.rule_alerts and not req.series:
+        return {"summary": _fallback_alert_summary(req), "mode": "fallback"}
 
-【latest（可能为空）】
-{req.latest}
+    prompt = _ALERTS_PROMPT_TPL.substitute(
+        repo_name=req.repo_name,
+        month=req.month,
+        rule_alerts=_dumps(req.rule_alerts),
+        series=_dumps(req.series),
+        latest=_dumps(req.latest),
+    )
 
-输出要求：
-1) 每条包含：**风险点** + **影响** + **建议（可执行）**
-2) 优先覆盖规则告警中 `level=high/medium` 的项
-3) 信息不足时用“可能/建议进一步确认”表达
-""".strip()
+    model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    cache_key = _llm_cache_key(model, prompt)
+    cached = await _llm_cache_get(cache_key)
+    if cached is not None:
+        return cached
 
     try:
-        resp = client.chat.completions.create(
-            model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+        resp = await _chat_create(
+            model=model,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt},
@@ -472,7 +1011,14 @@ async def gen_alerts(req: AlertsReq):
         }
 
     text = (resp.choices[0].message.content or "").strip()
-    return {"summary": text, "mode": "llm"}
+    payload = {"summary": text, "mode": "llm"}
+    await _llm_cache_set(cache_key, payload)
+    return payload
+
+
+@app.post("/api/alerts")
+async def gen_alerts(req: AlertsReq):
+    return ORJSONResponse(await _gen_alerts(req))
 
 
 def _fallback_intro(req: IntroReq) -> str:
@@ -486,40 +1032,33 @@ def _fallback_intro(req: IntroReq) -> str:
     return "".join(parts)
 
 
-@app.post("/api/intro")
-async def gen_intro(req: IntroReq):
+async def _gen_intro(req: IntroReq) -> dict[str, Any]:
     api_key = os.environ.get("OPENAI_API_KEY")
     # 没有 key 也要可用：直接兜底
     if not api_key:
         return {"intro": _fallback_intro(req), "mode": "fallback"}
 
-    client = OpenAI(
-        api_key=api_key,
-        base_url=os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-    )
-
-    prompt = f"""
-你是开源项目大屏展示的文案助手。请为该仓库生成一段“简短项目简介”，用于大屏弹窗展示：
-
-【项目】
-- repo_name: {req.repo_name}
-- month: {req.month}
-
-【元数据（可能为空）】
-{req.meta}
+    # 输入太薄（没有任何指标）时 LLM 也只能看 meta 说话，兜底文案同样可用：
+    # 直接省掉一次完整往返和 token 花销
+    if not req.latest and (req.meta or {}).get("repo_language"):
+        return {"intro": _fallback_intro(req), "mode": "fallback"}
 
-【关键指标（可能为空）】
-{req.latest}
+    prompt = _INTRO_PROMPT_TPL.substitute(
+        repo_name=req.repo_name,
+        month=req.month,
+        meta=_dumps(req.meta),
+        latest=_dumps(req.latest),
+    )
 
-要求：
-1) 中文输出，2~4 句，总字数控制在 60~120 字
-2) 不要编造具体事实（如用户数/公司/下载量等）；只做可能性的描述
-3) 语气专业、克制、适合大屏
-""".strip()
+    model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    cache_key = _llm_cache_key(model, prompt)
+    cached = await _llm_cache_get(cache_key)
+    if cached is not None:
+        return cached
 
     try:
-        resp = client.chat.completions.create(
-            model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+        resp = await _chat_create(
+            model=model,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt},
@@ -534,7 +1073,55 @@ async def gen_intro(req: IntroReq):
         }
 
     text = (resp.choices[0].message.content or "").strip()
-    return {"intro": text, "mode": "llm"}
+    payload = {"intro": text, "mode": "llm"}
+    await _llm_cache_set(cache_key, payload)
+    return payload
+
+
+@app.post("/api/intro")
+async def gen_intro(req: IntroReq, request: Request):
+    return _etag_response(request, await _gen_intro(req))
+
+
+class DashboardReq(BaseModel):
+    repo_name: str
+    month: str | None = None
+    meta: dict[str, Any] | None = None
+    latest: dict[str, Any] | None = None
+    series: list[dict[str, Any]] | None = None
+    rule_alerts: list[dict[str, Any]] | None = None
+
+
+@app.post("/api/dashboard")
+async def gen_dashboard(req: DashboardReq):
+    """一次请求并发生成 report/alerts/intro，替代前端三连 POST。
+
+    三个 LLM 调用共享连接池并发执行，总时延 ≈ max(三者) 而非 sum；
+    任一子任务失败只降级对应字段，不拖垮整个面板。
+    """
+    report, alerts, intro = await asyncio.gather(
+        _gen_report(ReportReq(repo_name=req.repo_name, month=req.month, latest=req.latest or {})),
+        _gen_alerts(
+            AlertsReq(
+                repo_name=req.repo_name,
+                month=req.month,
+                latest=req.latest or {},
+                series=req.series,
+                rule_alerts=req.rule_alerts,
+            )
+        ),
+        _gen_intro(IntroReq(repo_name=req.repo_name, month=req.month, meta=req.meta, latest=req.latest)),
+        return_exceptions=True,
+    )
+
+    def _part(x: Any) -> Any:
+        if isinstance(x, HTTPException):
+            return {"error": x.detail}
+        if isinstance(x, BaseException):
+            return {"error": f"{type(x).__name__}: {x}"}
+        return x
+
+    return {"report": _part(report), "alerts": _part(alerts), "intro": _part(intro)}
 
 
 @app.post("/api/alerts_v2")
@@ -548,90 +1135,41 @@ async def gen_alerts_v2(req: AlertsV2Req):
     if not api_key:
         obj = _fallback_alerts_v2(req)
         md = _render_alerts_v2_markdown(obj)
-        return {"data": obj.model_dump(), "markdown": md, "mode": "fallback"}
+        return {"data": orjson.loads(obj.model_dump_json()), "markdown": md, "mode": "fallback"}
 
     # 计算时间窗口对比（供模型引用，禁止编造）
-    comparisons = _compute_time_window_comparisons(
+    comparisons = _comparisons_cached(
+        req.repo_name,
+        req.month,
         req.series,
-        metrics=[
-            ("Activity", "kpi_activity", None),
-            ("New PRs / mo", "kpi_new_prs_month", "kpi_new_prs_month_log"),
-            ("New Issues / mo", "kpi_new_issues_month", "kpi_new_issues_month_log"),
-            ("PR Response Median (h)", "lat_pr_response_median", None),
-            ("PR Resolution Median (h)", "lat_pr_resolution_median", None),
-            ("Issue Response Median (h)", "lat_issue_response_median", None),
-            ("Bus Factor", "bus_factor", None),
-            ("Active Contributors / mo", "kpi_active_contributors_month", None),
-        ],
+        metrics=_ALERTS_METRICS,
     )
 
-    client = OpenAI(
-        api_key=api_key,
-        base_url=os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-    )
 
     # 让模型只输出 JSON（严格 schema），前端再渲染；并要求“为什么触发/没触发”、更具体的行动项。
-    prompt = f"""
-你是开源项目治理风险预警分析助手。请基于提供的数据，输出一个“结构化 JSON”，供前端做卡片化展示。
-要求：
-1) 必须中文输出（除 metric 名可保留原字段名）。
-2) 不得编造外部事实；数值只能引用输入中给出的 comparisons 或 latest/series。
-3) 必须包含：时间窗口对比（last1 vs prev3、last3 vs prev3）、为什么触发/为什么没触发、具体行动建议（负责人/节奏/SLA/成功判据）、最后给 3 个“下一步关注指标”。
-4) 只输出 JSON，不要 Markdown，不要代码块。
+    prompt = await _alerts_v2_prompt(_ALERTS_V2_PROMPT_TPL, req, comparisons)
 
-【项目】
-- repo_name: {req.repo_name}
-- month: {req.month}
-
-【规则告警（优先参考，可解释、可信）】
-{req.rule_alerts}
-
-【时间窗口对比（已由系统计算，允许引用；禁止编造）】
-{comparisons}
-
-【latest（可能为空）】
-{req.latest}
-
-JSON Schema（字段必须齐全）：
-{{
-  "schema": "openpulse.alerts.v2",
-  "repo_name": "...",
-  "month": "...",
-  "summary": "1-2 句摘要（适合大屏）",
-  "next_metrics": ["metric_a","metric_b","metric_c"],
-  "comparisons": <原样透传 comparisons>,
-  "why_triggered": ["...","..."],
-  "why_not_triggered": ["...","..."],
-  "risks": [
-    {{
-      "id": "rule_id_or_custom",
-      "level": "high|medium|low",
-      "title": "短标题",
-      "risk": "风险点（具体）",
-      "impact": "影响（具体）",
-      "evidence": ["证据1（含指标名/变化口径）", "证据2..."],
-      "actions": [
-        {{"owner":"负责人角色","cadence":"节奏/频率","sla":"SLA/时限","success":"成功判据（可量化）"}}
-      ]
-    }}
-  ]
-}}
-""".strip()
+    model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    cache_key = _llm_cache_key(model, prompt)
+    cached = await _llm_cache_get(cache_key)
+    if cached is not None:
+        return cached
 
     try:
-        resp = client.chat.completions.create(
-            model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+        resp = await _chat_create(
+            model=model,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt},
             ],
             temperature=0.2,
+            response_format={"type": "json_object"},
         )
     except Exception as e:
-        obj = _fallback_alerts_v2(req)
+        obj = _fallback_alerts_v2(req, comparisons)
         md = _render_alerts_v2_markdown(obj)
         return {
-            "data": obj.model_dump(),
+            "data": orjson.loads(obj.model_dump_json()),
             "markdown": md,
             "mode": "fallback",
             "detail": f"Upstream LLM error: {type(e).__name__}: {e}",
@@ -639,19 +1177,22 @@ JSON Schema（字段必须齐全）：
 
     text = (resp.choices[0].message.content or "").strip()
     # 解析失败也要兜底：前端至少有可用结构
+    parsed = True
     try:
-        import json as _json
-
-        raw = _json.loads(text)
-        obj = AlertsV2Resp.model_validate(raw)
+        obj = AlertsV2Resp.model_validate(orjson.loads(text))
     except Exception:
-        obj = _fallback_alerts_v2(req)
+        obj = _fallback_alerts_v2(req, comparisons)
+        parsed = False
     md = _render_alerts_v2_markdown(obj)
-    return {"data": obj.model_dump(), "markdown": md, "mode": "llm"}
+    payload = {"data": orjson.loads(obj.model_dump_json()), "markdown": md, "mode": "llm"}
+    if parsed:
+        # 兜底结果不缓存，避免把降级内容固化一整天
+        await _llm_cache_set(cache_key, payload)
+    return payload
 
 
 @app.post("/api/alerts_v2/stream")
-async def gen_alerts_v2_stream(req: AlertsV2Req):
+async def gen_alerts_v2_stream(req: AlertsV2Req, request: Request):
     """
     v2：SSE 流式输出。
     事件：
@@ -665,109 +1206,90 @@ async def gen_alerts_v2_stream(req: AlertsV2Req):
 
     async def gen():
         # meta
-        yield _sse_event('{"schema":"openpulse.stream.v1"}', event="meta")
+        yield _SSE_META_FRAME
 
         if not api_key:
             obj = _fallback_alerts_v2(req)
-            import json as _json
-
-            full = _json.dumps(obj.model_dump(), ensure_ascii=False)
+            full = obj.model_dump_json()
             # 兜底也“流式”切片输出，保证观感一致
-            for i in range(0, len(full), 240):
-                yield _sse_event(full[i : i + 240], event="delta")
-            yield _sse_event(full, event="done")
+            for frame in _sse_stream_json(full):
+                yield frame
             return
 
-        comparisons = _compute_time_window_comparisons(
+        comparisons = _comparisons_cached(
+            req.repo_name,
+            req.month,
             req.series,
-            metrics=[
-                ("Activity", "kpi_activity", None),
-                ("New PRs / mo", "kpi_new_prs_month", "kpi_new_prs_month_log"),
-                ("New Issues / mo", "kpi_new_issues_month", "kpi_new_issues_month_log"),
-                ("PR Response Median (h)", "lat_pr_response_median", None),
-                ("PR Resolution Median (h)", "lat_pr_resolution_median", None),
-                ("Issue Response Median (h)", "lat_issue_response_median", None),
-                ("Bus Factor", "bus_factor", None),
-                ("Active Contributors / mo", "kpi_active_contributors_month", None),
-            ],
+            metrics=_ALERTS_METRICS,
         )
 
-        client = OpenAI(
-            api_key=api_key,
-            base_url=os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-        )
-
-        prompt = f"""
-你是开源项目治理风险预警分析助手。请基于提供的数据，输出一个“结构化 JSON”，供前端做卡片化展示。
-要求：中文输出；不得编造外部事实；数值只能引用输入中的 comparisons/latest/series；只输出 JSON（不要 Markdown/代码块）。
-必须包含：时间窗口对比、为什么触发/为什么没触发、具体行动建议（负责人/节奏/SLA/成功判据）、下一步关注指标（3 个）。
-
-【项目】repo_name={req.repo_name} month={req.month}
-【规则告警】{req.rule_alerts}
-【时间窗口对比】{comparisons}
-【latest】{req.latest}
+        prompt = await _alerts_v2_prompt(_ALERTS_V2_STREAM_PROMPT_TPL, req, comparisons)
 
-JSON Schema（字段必须齐全）：
-{{
-  "schema":"openpulse.alerts.v2",
-  "repo_name":"...",
-  "month":"...",
-  "summary":"...",
-  "next_metrics":["...","...","..."],
-  "comparisons": {comparisons},
-  "why_triggered":["..."],
-  "why_not_triggered":["..."],
-  "risks":[
-    {{"id":"...","level":"high|medium|low","title":"...","risk":"...","impact":"...","evidence":["..."],"actions":[{{"owner":"...","cadence":"...","sla":"...","success":"..."}}]}}
-  ]
-}}
-""".strip()
+        model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+        cache_key = _llm_cache_key(model, prompt)
+        cached = await _llm_cache_get(cache_key)
+        if cached is not None:
+            # 缓存命中：按切片重放，保持前端“打字机”观感
+            for frame in _sse_stream_json(cached["text"]):
+                yield frame
+            return
 
-        full_buf: list[str] = []
+        # 完整文本只进一个 StringIO 累积缓冲（done 事件与缓存都要用），
+        # 不再额外保留整份 delta 列表，流式期间峰值内存从 ~2x 降到 ~1x
+        full_acc = io.StringIO()
+        # 小 delta 攒批：>=128 字符或 50ms 一刷，帧数降一到两个量级且肉眼无感
+        buf: list[str] = []
+        buf_len = 0
+        loop = asyncio.get_running_loop()
+        last_flush = loop.time()
         try:
-            stream = client.chat.completions.create(
-                model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+            stream = await _chat_create(
+                model=model,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant."},
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.2,
                 stream=True,
+                response_format={"type": "json_object"},
             )
-            for ev in stream:
+            async for ev in stream:
                 delta = ev.choices[0].delta.content if ev.choices else None
                 if not delta:
                     continue
-                full_buf.append(delta)
-                yield _sse_event(delta, event="delta")
+                buf.append(delta)
+                buf_len += len(delta)
+                now = loop.time()
+                if buf_len >= 128 or (now - last_flush) > 0.05:
+                    chunk = "".join(buf)
+                    full_acc.write(chunk)
+                    yield _sse_event(chunk, event="delta")
+                    buf.clear()
+                    buf_len = 0
+                    last_flush = now
         except Exception as e:
             # 上游失败：直接输出兜底（仍然用流式）
-            obj = _fallback_alerts_v2(req)
-            import json as _json
-
-            full = _json.dumps(obj.model_dump(), ensure_ascii=False)
+            obj = _fallback_alerts_v2(req, comparisons)
+            full = obj.model_dump_json()
             yield _sse_event(f"Upstream LLM error: {type(e).__name__}: {e}", event="error")
-            for i in range(0, len(full), 240):
-                yield _sse_event(full[i : i + 240], event="delta")
-            yield _sse_event(full, event="done")
+            for frame in _sse_stream_json(full):
+                yield frame
             return
 
-        full_text = "".join(full_buf).strip()
+        if buf:
+            chunk = "".join(buf)
+            full_acc.write(chunk)
+            yield _sse_event(chunk, event="delta")
+
+        full_text = full_acc.getvalue().strip()
+        await _llm_cache_set(cache_key, {"text": full_text})
         yield _sse_event(full_text, event="done")
 
-    return StreamingResponse(
-        gen(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
+    return _sse_response(request, gen())
 
 
 @app.post("/api/report_v2/stream")
-async def gen_report_v2_stream(req: ReportV2Req):
+async def gen_report_v2_stream(req: ReportV2Req, request: Request):
     """
     v2：报告同样提供 SSE 流式结构化 JSON（前端可渲染摘要/章节/行动项）。
     目前以 alerts_v2 同样的模式实现，便于前端复用解析逻辑。
@@ -775,23 +1297,14 @@ async def gen_report_v2_stream(req: ReportV2Req):
     api_key = os.environ.get("OPENAI_API_KEY")
 
     async def gen():
-        yield _sse_event('{"schema":"openpulse.stream.v1"}', event="meta")
+        yield _SSE_META_FRAME
 
         # 统一 comparisons，供报告也引用“时间窗口对比”
-        comparisons = _compute_time_window_comparisons(
+        comparisons = _comparisons_cached(
+            req.repo_name,
+            req.month,
             req.series,
-            metrics=[
-                ("Activity", "kpi_activity", None),
-                ("New PRs / mo", "kpi_new_prs_month", "kpi_new_prs_month_log"),
-                ("New Issues / mo", "kpi_new_issues_month", "kpi_new_issues_month_log"),
-                ("PR Response Median (h)", "lat_pr_response_median", None),
-                ("PR Resolution Median (h)", "lat_pr_resolution_median", None),
-                ("Issue Response Median (h)", "lat_issue_response_median", None),
-                ("Bus Factor", "bus_factor", None),
-                ("Active Contributors / mo", "kpi_active_contributors_month", None),
-                ("Stars Δ / mo", "kpi_stars_delta_month", None),
-                ("OpenRank", "kpi_openrank", None),
-            ],
+            metrics=_REPORT_METRICS,
         )
 
         if not api_key:
@@ -803,7 +1316,8 @@ async def gen_report_v2_stream(req: ReportV2Req):
                     latest=req.latest or {},
                     series=req.series,
                     rule_alerts=req.rule_alerts or [],
-                )
+                ),
+                comparisons,
             )
             obj = ReportV2Resp(
                 repo_name=req.repo_name,
@@ -825,65 +1339,63 @@ async def gen_report_v2_stream(req: ReportV2Req):
                 ],
                 next_metrics=base.next_metrics,
             )
-            import json as _json
-
-            full = _json.dumps(obj.model_dump(), ensure_ascii=False)
-            for i in range(0, len(full), 240):
-                yield _sse_event(full[i : i + 240], event="delta")
-            yield _sse_event(full, event="done")
+            full = obj.model_dump_json()
+            for frame in _sse_stream_json(full):
+                yield frame
             return
 
-        client = OpenAI(
-            api_key=api_key,
-            base_url=os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-        )
-
-        prompt = f"""
-你是开源项目治理分析专家。请基于输入数据生成一份“结构化 JSON 报告”，用于前端大屏弹窗卡片化渲染。
-要求：
-1) 中文输出；不得编造外部事实；数值只能引用输入中的 comparisons/latest/series。
-2) 必须包含：Executive Summary（3-5 条）、风险项（含证据与行动）、治理行动清单（负责人/节奏/SLA/成功判据）、下一步关注指标（3 个）。
-3) 只输出 JSON（不要 Markdown/代码块）。
 
-【项目】repo_name={req.repo_name} month={req.month}
-【meta】{req.meta}
-【latest】{req.latest}
-【规则告警】{req.rule_alerts}
-【时间窗口对比】{comparisons}
+        prompt = _REPORT_V2_STREAM_PROMPT_TPL.format(
+            repo_name=req.repo_name,
+            month=req.month,
+            meta=_dumps(req.meta),
+            latest=_dumps(req.latest),
+            rule_alerts=_dumps(req.rule_alerts),
+            comparisons=_dumps(comparisons),
+        )
 
-JSON Schema（字段必须齐全）：
-{{
-  "schema":"openpulse.report.v2",
-  "repo_name":"...",
-  "month":"...",
-  "title":"...",
-  "executive_summary":["...","...","..."],
-  "comparisons": {comparisons},
-  "risks":[
-    {{"id":"...","level":"high|medium|low","title":"...","risk":"...","impact":"...","evidence":["..."],"actions":[{{"owner":"...","cadence":"...","sla":"...","success":"..."}}]}}
-  ],
-  "governance_actions":[{{"owner":"...","cadence":"...","sla":"...","success":"..."}}],
-  "next_metrics":["...","...","..."]
-}}
-""".strip()
+        model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+        cache_key = _llm_cache_key(model, prompt)
+        cached = await _llm_cache_get(cache_key)
+        if cached is not None:
+            # 缓存命中：按切片重放，保持前端“打字机”观感
+            for frame in _sse_stream_json(cached["text"]):
+                yield frame
+            return
 
-        full_buf: list[str] = []
+        # 完整文本只进一个 StringIO 累积缓冲（done 事件与缓存都要用），
+        # 不再额外保留整份 delta 列表，流式期间峰值内存从 ~2x 降到 ~1x
+        full_acc = io.StringIO()
+        # 小 delta 攒批：>=128 字符或 50ms 一刷，帧数降一到两个量级且肉眼无感
+        buf: list[str] = []
+        buf_len = 0
+        loop = asyncio.get_running_loop()
+        last_flush = loop.time()
         try:
-            stream = client.chat.completions.create(
-                model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+            stream = await _chat_create(
+                model=model,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant."},
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.2,
                 stream=True,
+                response_format={"type": "json_object"},
             )
-            for ev in stream:
+            async for ev in stream:
                 delta = ev.choices[0].delta.content if ev.choices else None
                 if not delta:
                     continue
-                full_buf.append(delta)
-                yield _sse_event(delta, event="delta")
+                buf.append(delta)
+                buf_len += len(delta)
+                now = loop.time()
+                if buf_len >= 128 or (now - last_flush) > 0.05:
+                    chunk = "".join(buf)
+                    full_acc.write(chunk)
+                    yield _sse_event(chunk, event="delta")
+                    buf.clear()
+                    buf_len = 0
+                    last_flush = now
         except Exception as e:
             yield _sse_event(f"Upstream LLM error: {type(e).__name__}: {e}", event="error")
             # fallback：仍输出一个离线报告结构
@@ -894,7 +1406,8 @@ JSON Schema（字段必须齐全）：
                     latest=req.latest or {},
                     series=req.series,
                     rule_alerts=req.rule_alerts or [],
-                )
+                ),
+                comparisons,
             )
             obj = ReportV2Resp(
                 repo_name=req.repo_name,
@@ -906,30 +1419,25 @@ JSON Schema（字段必须齐全）：
                 governance_actions=base.risks[0].actions if base.risks else [],
                 next_metrics=base.next_metrics,
             )
-            import json as _json
-
-            full = _json.dumps(obj.model_dump(), ensure_ascii=False)
-            for i in range(0, len(full), 240):
-                yield _sse_event(full[i : i + 240], event="delta")
-            yield _sse_event(full, event="done")
+            full = obj.model_dump_json()
+            for frame in _sse_stream_json(full):
+                yield frame
             return
 
-        full_text = "".join(full_buf).strip()
+        if buf:
+            chunk = "".join(buf)
+            full_acc.write(chunk)
+            yield _sse_event(chunk, event="delta")
+
+        full_text = full_acc.getvalue().strip()
+        await _llm_cache_set(cache_key, {"text": full_text})
         yield _sse_event(full_text, event="done")
 
-    return StreamingResponse(
-        gen(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
+    return _sse_response(request, gen())
 
 
 @app.post("/api/intro_v2/stream")
-async def gen_intro_v2_stream(req: IntroV2Req):
+async def gen_intro_v2_stream(req: IntroV2Req, request: Request):
     """
     v2：简介也支持 SSE（短文本，主要是为了统一交互体验）。
     done 事件 data 为 JSON 字符串：{"schema":"openpulse.intro.v2",...}
@@ -937,74 +1445,80 @@ async def gen_intro_v2_stream(req: IntroV2Req):
     api_key = os.environ.get("OPENAI_API_KEY")
 
     async def gen():
-        yield _sse_event('{"schema":"openpulse.stream.v1"}', event="meta")
+        yield _SSE_META_FRAME
 
         if not api_key:
             obj = IntroV2Resp(repo_name=req.repo_name, month=req.month, intro=_fallback_intro(IntroReq(**req.model_dump())))
-            import json as _json
-
-            full = _json.dumps(obj.model_dump(), ensure_ascii=False)
-            for i in range(0, len(full), 240):
-                yield _sse_event(full[i : i + 240], event="delta")
-            yield _sse_event(full, event="done")
+            full = obj.model_dump_json()
+            for frame in _sse_stream_json(full):
+                yield frame
             return
 
-        client = OpenAI(
-            api_key=api_key,
-            base_url=os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-        )
-
-        prompt = f"""
-你是开源项目大屏展示的文案助手。请生成“结构化 JSON”，只包含一个 intro 字段（中文 60~120 字，2~4 句），用于弹窗展示。
-不得编造外部事实；只做可能性描述；只输出 JSON（不要 Markdown/代码块）。
 
-输入：
-repo_name={req.repo_name}
-month={req.month}
-meta={req.meta}
-latest={req.latest}
+        prompt = _INTRO_V2_STREAM_PROMPT_TPL.format(
+            repo_name=req.repo_name,
+            month=req.month,
+            meta=_dumps(req.meta),
+            latest=_dumps(req.latest),
+        )
 
-JSON Schema：
-{{"schema":"openpulse.intro.v2","repo_name":"...","month":"...","intro":"..."}}
-""".strip()
+        model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+        cache_key = _llm_cache_key(model, prompt)
+        cached = await _llm_cache_get(cache_key)
+        if cached is not None:
+            # 缓存命中：按切片重放，保持前端“打字机”观感
+            for frame in _sse_stream_json(cached["text"]):
+                yield frame
+            return
 
-        full_buf: list[str] = []
+        # 完整文本只进一个 StringIO 累积缓冲（done 事件与缓存都要用），
+        # 不再额外保留整份 delta 列表，流式期间峰值内存从 ~2x 降到 ~1x
+        full_acc = io.StringIO()
+        # 小 delta 攒批：>=128 字符或 50ms 一刷，帧数降一到两个量级且肉眼无感
+        buf: list[str] = []
+        buf_len = 0
+        loop = asyncio.get_running_loop()
+        last_flush = loop.time()
         try:
-            stream = client.chat.completions.create(
-                model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+            stream = await _chat_create(
+                model=model,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant."},
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.3,
                 stream=True,
+                response_format={"type": "json_object"},
             )
-            for ev in stream:
+            async for ev in stream:
                 delta = ev.choices[0].delta.content if ev.choices else None
                 if not delta:
                     continue
-                full_buf.append(delta)
-                yield _sse_event(delta, event="delta")
+                buf.append(delta)
+                buf_len += len(delta)
+                now = loop.time()
+                if buf_len >= 128 or (now - last_flush) > 0.05:
+                    chunk = "".join(buf)
+                    full_acc.write(chunk)
+                    yield _sse_event(chunk, event="delta")
+                    buf.clear()
+                    buf_len = 0
+                    last_flush = now
         except Exception as e:
             yield _sse_event(f"Upstream LLM error: {type(e).__name__}: {e}", event="error")
             obj = IntroV2Resp(repo_name=req.repo_name, month=req.month, intro=_fallback_intro(IntroReq(**req.model_dump())))
-            import json as _json
-
-            full = _json.dumps(obj.model_dump(), ensure_ascii=False)
-            for i in range(0, len(full), 240):
-                yield _sse_event(full[i : i + 240], event="delta")
-            yield _sse_event(full, event="done")
+            full = obj.model_dump_json()
+            for frame in _sse_stream_json(full):
+                yield frame
             return
 
-        full_text = "".join(full_buf).strip()
+        if buf:
+            chunk = "".join(buf)
+            full_acc.write(chunk)
+            yield _sse_event(chunk, event="delta")
+
+        full_text = full_acc.getvalue().strip()
+        await _llm_cache_set(cache_key, {"text": full_text})
         yield _sse_event(full_text, event="done")
 
-    return StreamingResponse(
-        gen(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
+    return _sse_response(request, gen())
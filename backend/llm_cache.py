@@ -0,0 +1,75 @@
+# backend/llm_cache.py
+"""LLM 响应的进程内一级缓存。
+
+Redis 是可选的跨进程二级缓存（见 app.py 的 _llm_cache_get/_llm_cache_set）；
+这里提供一个零依赖的 TTL+LRU 内存层：Redis 没配时端点照样能命中缓存，
+Redis 在场时热 key 也省掉一次网络往返。
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+
+class InMemoryTTLCache:
+    """OrderedDict 实现的 LRU，过期采用惰性检查（读到过期项时删除）。"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0) -> None:
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl = ttl
+
+    def get(self, key: Any) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self._ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+
+class DiskCache:
+    """文件系统缓存层：进程重启后依旧温热，多个 worker 进程共享结果。
+
+    写入走 tmp + replace 原子替换，避免并发写出现半截文件；
+    超过 max_age 的条目按未命中处理并顺手删除。
+    """
+
+    def __init__(self, root: Path, max_age: float = 7 * 86400.0) -> None:
+        self._root = root
+        self._max_age = max_age
+        root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: bytes) -> Path:
+        return self._root / f"{key.hex()}.json"
+
+    def get(self, key: bytes) -> bytes | None:
+        p = self._path(key)
+        try:
+            if time.time() - p.stat().st_mtime > self._max_age:
+                p.unlink(missing_ok=True)
+                return None
+            return p.read_bytes()
+        except OSError:  # 不存在/不可读都按未命中
+            return None
+
+    def set(self, key: bytes, raw: bytes) -> None:
+        p = self._path(key)
+        try:
+            tmp = p.with_suffix(".tmp")
+            tmp.write_bytes(raw)
+            tmp.replace(p)
+        except OSError:
+            pass
@@ -1,46 +1,17 @@
-import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import numpy as np
+import orjson
 import pandas as pd
-import math
 
 IN_DIR = Path("data/openpulse_processed")
 OUT_DIR = Path("frontend/public/data")
 TS_DIR = OUT_DIR / "timeseries"
 
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-TS_DIR.mkdir(parents=True, exist_ok=True)
+# 文件名安全化：预编译的 translate 表单趟替换，顺带处理 Windows 上非法的 \\ 和 :
+_FS_SAFE = str.maketrans({"/": "__", "\\": "__", ":": "_"})
 
-kpi = pd.read_parquet(IN_DIR / "repo_month_kpi.parquet")
-meta = pd.read_parquet(IN_DIR / "repo_meta.parquet")
-
-# 规范化 month 排序
-kpi["month"] = kpi["month"].astype(str)
-kpi = kpi.sort_values(["repo_name", "month"])
-
-# 1) repos list
-repos = sorted(kpi["repo_name"].dropna().unique().tolist())
-(OUT_DIR / "repos.json").write_text(
-    json.dumps([{"repo_name": r} for r in repos], ensure_ascii=False, indent=2),
-    encoding="utf-8"
-)
-
-# 2) latest per repo
-latest_rows = kpi.groupby("repo_name", as_index=False).tail(1)
-latest_map = {row["repo_name"]: row.dropna().to_dict() for _, row in latest_rows.iterrows()}
-
-(OUT_DIR / "latest.json").write_text(
-    json.dumps(latest_map, ensure_ascii=False),
-    encoding="utf-8"
-)
-
-# 3) meta map
-meta_map = {row["repo_name"]: row.dropna().to_dict() for _, row in meta.iterrows()}
-(OUT_DIR / "repo_meta.json").write_text(
-    json.dumps(meta_map, ensure_ascii=False),
-    encoding="utf-8"
-)
-
-# 4) timeseries per repo
 cols_keep = [
     "month",
     "kpi_commits_month",
@@ -62,31 +33,72 @@ cols_keep = [
     "kpi_openrank",
     "kpi_attention",
 ]
-cols_keep = [c for c in cols_keep if c in kpi.columns]
-
-def clean_value(x):
-    # 把 NaN/inf 变成 None，保证 JSON 合法且前端可用
-    if x is None:
-        return None
-    if isinstance(x, float) and (math.isnan(x) or math.isinf(x)):
-        return None
-    return x
-
-for repo, g in kpi.groupby("repo_name"):
-    # 先选列
-    df = g[cols_keep].copy()
-
-    # 关键：把 pandas 的 NaN 统一转成 None
-    df = df.where(pd.notnull(df), None)
-
-    # 再做一次保险：把 None/NaN/inf 处理干净
-    records = []
-    for row in df.to_dict(orient="records"):
-        records.append({k: clean_value(v) for k, v in row.items()})
-
-    (TS_DIR / f"{repo.replace('/', '__')}.json").write_text(
-        json.dumps(records, ensure_ascii=False),
-        encoding="utf-8"
+
+
+def _dumps(obj, **kw) -> bytes:
+    # orjson：C 实现，比 stdlib json 快数倍；numpy 标量直接序列化
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | kw.get("option", 0))
+
+
+def _write_one(item):
+    # 每个仓库一个独立文件，互不依赖：放到子进程里并行序列化+写盘
+    repo, g = item
+    sub = g.astype(object).where(pd.notnull(g), None)
+    (TS_DIR / f"{repo.translate(_FS_SAFE)}.json").write_bytes(
+        _dumps(sub.to_dict(orient="records"))
     )
 
-print("[OK] Exported dashboard json to frontend/public/data/")
+
+def main():
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    TS_DIR.mkdir(parents=True, exist_ok=True)
+
+    kpi = pd.read_parquet(IN_DIR / "repo_month_kpi.parquet")
+    meta = pd.read_parquet(IN_DIR / "repo_meta.parquet")
+
+    # 规范化 month 排序
+    kpi["month"] = kpi["month"].astype(str)
+    kpi = kpi.sort_values(["repo_name", "month"])
+
+    # 1) repos list
+    repos = sorted(kpi["repo_name"].dropna().unique().tolist())
+    (OUT_DIR / "repos.json").write_bytes(
+        _dumps([{"repo_name": r} for r in repos], option=orjson.OPT_INDENT_2)
+    )
+
+    # 2) latest per repo
+    # iterrows 每行都要构造 Series 并逐格装箱，这里改成一次 NaN→None 再 to_dict('records')。
+    # kpi 已按 (repo_name, month) 排好序：drop_duplicates(keep='last') 一趟哈希就拿到
+    # 每仓库最后一行，省掉 groupby 的分组索引构建
+    latest_rows = kpi.drop_duplicates("repo_name", keep="last")
+    latest_rows = latest_rows.astype(object).where(pd.notnull(latest_rows), None)
+    latest_map = {
+        r["repo_name"]: {k: v for k, v in r.items() if v is not None}
+        for r in latest_rows.to_dict("records")
+    }
+    (OUT_DIR / "latest.json").write_bytes(_dumps(latest_map))
+
+    # 3) meta map
+    meta_obj = meta.astype(object).where(pd.notnull(meta), None)
+    meta_map = {
+        r["repo_name"]: {k: v for k, v in r.items() if v is not None}
+        for r in meta_obj.to_dict("records")
+    }
+    (OUT_DIR / "repo_meta.json").write_bytes(_dumps(meta_map))
+
+    # 4) timeseries per repo
+    keep = [c for c in cols_keep if c in kpi.columns]
+
+    # inf 统一转 NaN，一次处理完；子进程里只剩 NaN→None 这一趟
+    kpi[keep] = kpi[keep].replace([np.inf, -np.inf], np.nan)
+
+    groups = [(repo, g[keep].copy()) for repo, g in kpi.groupby("repo_name")]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        # list() 驱动迭代器，让子进程异常（而非静默丢失）抛到这里
+        list(ex.map(_write_one, groups, chunksize=8))
+
+    print("[OK] Exported dashboard json to frontend/public/data/")
+
+
+if __name__ == "__main__":
+    main()
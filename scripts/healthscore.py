@@ -1,8 +1,11 @@
 # scripts/healthscore.py
 from pathlib import Path
 import json
+import os
 import numpy as np
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 POS = "pos"
 NEG = "neg"
@@ -41,23 +44,25 @@ DIM_DEF = {
     ],
 }
 
-def safe_minmax(x, vmin, vmax):
-    if x is None or (isinstance(x, float) and np.isnan(x)):
-        return 0.5
+def safe_minmax_array(arr, vmin, vmax):
+    # 批量版 min-max：整列一次减/除/clip，NaN 统一补 0.5（与旧标量版同口径）
     if vmax <= vmin:
-        return 0.5
-    y = (x - vmin) / (vmax - vmin)
-    return float(np.clip(y, 0.0, 1.0))
+        return np.full(arr.shape, 0.5)
+    y = np.clip((arr - vmin) / (vmax - vmin), 0.0, 1.0)
+    return np.where(np.isnan(arr), 0.5, y)
 
-def compute_stats(df, cols):
+def compute_stats(table, cols):
+    # Arrow 原生 min_max：SIMD 内核直接扫列存数据，这些列不经过 pandas 装箱；
+    # inf 先置 null（min_max 自动跳过 null），与旧版 replace(inf)+dropna 口径一致
     stats = {}
     for c in cols:
-        s = df[c]
-        s = s.replace([np.inf, -np.inf], np.nan).dropna()
-        if len(s) == 0:
+        arr = pc.cast(table.column(c), pa.float64())
+        mm = pc.min_max(pc.if_else(pc.is_finite(arr), arr, pa.scalar(None, type=pa.float64())))
+        mn = mm["min"].as_py()
+        if mn is None:  # 全空列：给个不会除零的默认区间
             stats[c] = {"min": 0.0, "max": 1.0}
         else:
-            stats[c] = {"min": float(s.min()), "max": float(s.max())}
+            stats[c] = {"min": float(mn), "max": float(mm["max"].as_py())}
     return stats
 
 def compute_scores(df, stats):
@@ -71,22 +76,25 @@ def compute_scores(df, stats):
     if "kpi_release_count_month" not in df.columns and "kpi_release_count_month_log" in df.columns:
         df["kpi_release_count_month"] = df["kpi_release_count_month_log"]
 
-    # 维度分
+    # 归一化：每列走一次 safe_minmax_array 内核（裸 numpy 数组，无 Series 对齐开销）
+    norm = {}
+    for c, st in stats.items():
+        if c not in df.columns:
+            continue
+        norm[c] = safe_minmax_array(df[c].to_numpy(dtype=np.float64), st["min"], st["max"])
+
+    # 维度分：列向量加权求和；缺列按 0.5 计（与逐行版本口径一致，NEG 翻转后仍是 0.5）
+    n = len(df)
     for dim, items in DIM_DEF.items():
         w = 1.0 / len(items)
-        dim_score = []
-        for _, row in df.iterrows():
-            acc = 0.0
-            for col, sign in items:
-                if col not in df.columns:
-                    v = 0.5
-                else:
-                    v = safe_minmax(row[col], stats[col]["min"], stats[col]["max"])
-                if sign == NEG:
-                    v = 1.0 - v
-                acc += w * v
-            dim_score.append(acc)
-        df[f"score_{dim}"] = dim_score
+        acc = np.zeros(n)
+        for col, sign in items:
+            if col not in norm:
+                acc += w * 0.5
+                continue
+            v = norm[col]
+            acc += w * ((1.0 - v) if sign == NEG else v)
+        df[f"score_{dim}"] = acc
 
     # 总分
     df["health_H"] = (
@@ -102,34 +110,75 @@ def compute_scores(df, stats):
 def main():
     out_dir = Path("data/openpulse_processed")
     kpi_path = out_dir / "repo_month_kpi.parquet"
-    df = pd.read_parquet(kpi_path)
-
-    # 统一把 NaN/inf 清掉
-    df = df.replace([np.inf, -np.inf], np.nan)
+    meta_path = out_dir / "health_norm_stats.meta.json"
+
+    # 幂等短路：输入 parquet 的 mtime+size 没变就不重算（cron/CI 重复跑零成本）；
+    # FORCE_RECOMPUTE=1 可强制重跑
+    st = kpi_path.stat()
+    fingerprint = {"src_mtime": st.st_mtime_ns, "src_size": st.st_size}
+    if os.environ.get("FORCE_RECOMPUTE") != "1" and meta_path.exists():
+        try:
+            if json.loads(meta_path.read_text(encoding="utf-8")) == fingerprint:
+                print("[skip] repo_month_kpi.parquet unchanged, nothing to do")
+                return
+        except (ValueError, OSError):
+            pass  # meta 损坏就当没有，正常重算
 
     # stats 需要覆盖所有可能用到的列
     all_cols = set()
     for items in DIM_DEF.values():
         for col, _ in items:
             all_cols.add(col)
-    # 绝对值列
+
+    table = pq.read_table(kpi_path)
+
+    # 绝对值列：Arrow 内核直接生成并挂到表上（stats/打分/回写共用一份）
+    if "kpi_code_change_lines_month" in table.schema.names:
+        abs_arr = pc.abs(pc.cast(table.column("kpi_code_change_lines_month"), pa.float64()))
+        name = "kpi_code_change_lines_month_abs"
+        idx = table.schema.get_field_index(name)
+        if idx >= 0:
+            table = table.set_column(idx, name, abs_arr)
+        else:
+            table = table.append_column(name, abs_arr)
+
+    # stats 直接在 Arrow 表上算，这一步完全不需要 pandas
     all_cols.add("kpi_code_change_lines_month_abs")
-    # 确保列存在
-    if "kpi_code_change_lines_month" in df.columns:
-        df["kpi_code_change_lines_month_abs"] = df["kpi_code_change_lines_month"].abs()
+    stats = compute_stats(table, [c for c in all_cols if c in table.schema.names])
 
-    cols_present = [c for c in all_cols if c in df.columns]
-    stats = compute_stats(df, cols_present)
+    # 列裁剪：文件要原样回写所以整表在 Arrow 里，但只把打分用到的列转成
+    # pandas（to_pandas 的逐列装箱才是大头），其余列留在 Arrow 表里不动。
+    # 额外带上 abs/fallback 的来源列
+    proj_cols = all_cols | {"kpi_code_change_lines_month", "kpi_release_count_month_log"}
+    needed = sorted(c for c in proj_cols if c in table.schema.names)
+    df = table.select(needed).to_pandas()
+
+    # 统一把 NaN/inf 清掉
+    df = df.replace([np.inf, -np.inf], np.nan)
 
     df2 = compute_scores(df, stats)
 
-    # 写回 parquet
-    df2.to_parquet(kpi_path, index=False)
+    # 写回 parquet：打分涉及的列替换/追加回 Arrow 表，未参与的列零拷贝透传
+    for c in df2.columns:
+        arr = pa.Array.from_pandas(df2[c])
+        idx = table.schema.get_field_index(c)
+        if idx >= 0:
+            table = table.set_column(idx, c, arr)
+        else:
+            table = table.append_column(c, arr)
+    pq.write_table(table, kpi_path)
 
     # 保存归一化 stats，前端也可用
     (out_dir / "health_norm_stats.json").write_text(
         json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8"
     )
+
+    # 记录回写后文件的指纹：下次输入没变时直接短路
+    st = kpi_path.stat()
+    meta_path.write_text(
+        json.dumps({"src_mtime": st.st_mtime_ns, "src_size": st.st_size}),
+        encoding="utf-8",
+    )
     print("✅ health_score computed & saved into repo_month_kpi.parquet")
 
 if __name__ == "__main__":
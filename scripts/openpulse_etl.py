@@ -3,15 +3,36 @@ from __future__ import annotations
 import argparse
 import json
 import os
-import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
 import duckdb
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from tqdm import tqdm
 
-MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+try:
+    import orjson  # 2-5x faster JSON decode; optional, stdlib json as fallback
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # streaming parse for big stars.json files (auto-picks yajl2_c backend); optional
+except ImportError:
+    ijson = None
+
+def _is_month(s: Any) -> bool:
+    # hot path: called once per JSON key; a few str ops beat a C-regex call
+    return (
+        type(s) is str
+        and len(s) == 7
+        and s[4] == "-"
+        and s[:4].isdigit()
+        and s[5:].isdigit()
+    )
 
 # -----------------------------
 # Metrics parsing
@@ -48,27 +69,83 @@ METRICS_FILE_MAP = {
     "stars.json": "stars",
 }
 
+def _month_series(obj: Dict[str, Any]) -> Dict[str, float]:
+    # shared month filter for all metric layouts: collect matching keys once,
+    # then let np.fromiter coerce the values in a single C loop instead of a
+    # per-item float() call in each dict comprehension
+    keys = [k for k in obj if _is_month(k)]
+    if not keys:
+        return {}
+    vals = np.fromiter((obj[k] for k in keys), dtype=np.float64, count=len(keys))
+    return dict(zip(keys, vals.tolist()))
+
 def safe_read_json(p: Path) -> Any:
+    if orjson is not None:
+        return orjson.loads(p.read_bytes())
     with p.open("r", encoding="utf-8") as f:
         return json.load(f)
 
+def write_parquet(data: "pd.DataFrame | pa.Table", path: Path) -> None:
+    # Arrow tables are written as-is (zero conversion); pandas frames get one
+    # from_pandas hop. zstd + dictionary encoding beats to_parquet's default
+    # snappy on both file size and downstream scan speed
+    table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+    pq.write_table(
+        table,
+        path,
+        compression="zstd",
+        compression_level=3,
+        use_dictionary=True,
+        row_group_size=1_000_000,
+    )
+
+def dump_jsonl(rows: List[Dict[str, Any]]) -> bytes:
+    # serialize a whole batch to one bytes blob: orjson's C serializer when
+    # available, and a single write per batch instead of one syscall per row
+    if orjson is not None:
+        return b"".join(orjson.dumps(r) + b"\n" for r in rows)
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode("utf-8")
+
 def detect_metrics_layout(obj: Any) -> str:
     if isinstance(obj, dict):
         if "avg" in obj and isinstance(obj["avg"], dict):
             return "avg_quantile"
         keys = list(obj.keys())[:5]
-        if keys and any(isinstance(k, str) and MONTH_RE.match(k) for k in keys):
+        if keys and any(_is_month(k) for k in keys):
             return "series"
     return "unknown"
 
+def _parse_stars_stream(path: Path) -> Dict[str, Dict[str, float]]:
+    # one streaming pass over stars.json: each key is classified as a month
+    # delta or a '-raw' cumulative total as it arrives, so the raw dict is
+    # never materialized and we skip the second full iteration
+    delta: Dict[str, float] = {}
+    raw: Dict[str, float] = {}
+    with path.open("rb") as f:
+        for k, v in ijson.kvitems(f, ""):
+            if _is_month(k):
+                delta[k] = float(v)
+            elif isinstance(k, str) and k.endswith("-raw") and _is_month(k[:-4]):
+                raw[k[:-4]] = float(v)
+    out: Dict[str, Dict[str, float]] = {}
+    if delta:
+        out["kpi_stars_delta_month"] = delta
+    if raw:
+        out["kpi_stars_total"] = raw
+    return out
+
 def parse_metric_file(path: Path) -> Dict[str, Dict[str, float]]:
-    obj = safe_read_json(path)
-    layout = detect_metrics_layout(obj)
     fname = path.name
     key = METRICS_FILE_MAP.get(fname)
     if key is None:
         return {}
 
+    if fname == "stars.json" and ijson is not None:
+        return _parse_stars_stream(path)
+
+    obj = safe_read_json(path)
+    layout = detect_metrics_layout(obj)
+
     out: Dict[str, Dict[str, float]] = {}
 
     # latency (use avg + median)
@@ -77,22 +154,22 @@ def parse_metric_file(path: Path) -> Dict[str, Dict[str, float]]:
             avg = obj.get("avg", {})
             q2 = obj.get("quantile_2", obj.get("quantile_1", {}))
             prefix = key.replace("lat_", "")
-            out[f"lat_{prefix}_avg"] = {m: float(v) for m, v in avg.items() if MONTH_RE.match(m)}
-            out[f"lat_{prefix}_median"] = {m: float(v) for m, v in q2.items() if MONTH_RE.match(m)}
+            out[f"lat_{prefix}_avg"] = _month_series(avg)
+            out[f"lat_{prefix}_median"] = _month_series(q2)
         elif layout == "series":
-            out[f"{key}_avg"] = {m: float(v) for m, v in obj.items() if MONTH_RE.match(m)}
+            out[f"{key}_avg"] = _month_series(obj)
         return out
 
     # stars: delta + total (if "-raw" exists)
     if fname == "stars.json" and isinstance(obj, dict):
-        delta = {m: float(v) for m, v in obj.items() if isinstance(m, str) and MONTH_RE.match(m)}
+        delta = _month_series(obj)
         if delta:
             out["kpi_stars_delta_month"] = delta
         raw = {}
         for k, v in obj.items():
             if isinstance(k, str) and k.endswith("-raw"):
                 m = k[:-4]
-                if MONTH_RE.match(m):
+                if _is_month(m):
                     raw[m] = float(v)
         if raw:
             out["kpi_stars_total"] = raw
@@ -100,61 +177,216 @@ def parse_metric_file(path: Path) -> Dict[str, Dict[str, float]]:
 
     # general
     if layout == "series":
-        out[key] = {m: float(v) for m, v in obj.items() if MONTH_RE.match(m)}
+        out[key] = _month_series(obj)
     elif layout == "avg_quantile":
-        out[key] = {m: float(v) for m, v in obj.get("avg", {}).items() if MONTH_RE.match(m)}
+        out[key] = _month_series(obj.get("avg", {}))
     return out
 
-def find_repo_dirs(metrics_root: Path) -> List[Path]:
-    repo_dirs = []
-    for root, _, files in os.walk(metrics_root):
-        root_p = Path(root)
-        if any(f.endswith(".json") for f in files):
-            # heuristic: keep dirs that look like repo folders
-            if len(list(root_p.glob("*.json"))) >= 5:
-                repo_dirs.append(root_p)
+def find_repo_dirs(metrics_root: Path) -> List[tuple[Path, List[str]]]:
+    # single os.scandir pass per directory: entry.is_file() reads the cached
+    # dirent instead of restat'ing like os.walk + glob('*.json') would.
+    # The json listing is returned alongside the dir so callers don't re-glob.
+    repo_dirs: List[tuple[Path, List[str]]] = []
+    stack = [metrics_root]
+    while stack:
+        d = stack.pop()
+        jsons: List[str] = []
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(Path(e.path))
+                    elif e.is_file() and e.name.endswith(".json"):
+                        jsons.append(e.name)
+        except OSError:
+            continue
+        # heuristic: keep dirs that look like repo folders
+        if len(jsons) >= 5:
+            repo_dirs.append((d, sorted(jsons)))
     return sorted(repo_dirs)
 
+def _parse_repo_dir(item: tuple[Path, List[str]]) -> tuple[str, Dict[str, Dict[str, float]]]:
+    # module-level (picklable) worker: parse one repo folder into {month: {col: val}}
+    d, jsons = item
+    month_dict: Dict[str, Dict[str, float]] = {}
+    for name in jsons:
+        parsed = parse_metric_file(d / name)
+        for col, series in parsed.items():
+            for month, val in series.items():
+                month_dict.setdefault(month, {})
+                month_dict[month][col] = val
+    return d.name, month_dict
+
 def build_metrics_kpi(metrics_root: Path) -> pd.DataFrame:
     repo_dirs = find_repo_dirs(metrics_root)
-    rows = []
-    for d in tqdm(repo_dirs, desc="Parsing top_300_metrics"):
-        repo = d.name
-        month_dict: Dict[str, Dict[str, float]] = {}
-        for jf in d.glob("*.json"):
-            parsed = parse_metric_file(jf)
-            for col, series in parsed.items():
-                for month, val in series.items():
-                    month_dict.setdefault(month, {})
-                    month_dict[month][col] = val
-        for month, kv in month_dict.items():
-            row = {"repo_name": repo, "month": month}
-            row.update(kv)
-            rows.append(row)
-
-    df = pd.DataFrame(rows)
-    if df.empty:
+    # columnar accumulation: one aligned list per KPI column (NaN for gaps),
+    # so pd.DataFrame gets clean float64 arrays instead of a list of ragged
+    # dicts that forces per-row dtype inference
+    repo_col: List[str] = []
+    month_col: List[str] = []
+    col_data: Dict[str, List[float]] = {}
+
+    # each repo dir is independent, CPU-bound JSON parsing: shard across cores
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        results = ex.map(_parse_repo_dir, repo_dirs, chunksize=8)
+        for repo, month_dict in tqdm(results, total=len(repo_dirs), desc="Parsing top_300_metrics"):
+            for kv in month_dict.values():
+                for col in kv:
+                    if col not in col_data:
+                        # column first seen now: backfill rows emitted before it
+                        col_data[col] = [np.nan] * len(repo_col)
+            for month, kv in month_dict.items():
+                repo_col.append(repo)
+                month_col.append(month)
+                for col, vals in col_data.items():
+                    vals.append(kv.get(col, np.nan))
+
+    if not repo_col:
         raise RuntimeError("No metrics parsed. Please check your top_300_metrics folder structure.")
+    df = pd.DataFrame(
+        {
+            "repo_name": repo_col,
+            "month": month_col,
+            **{c: np.asarray(v, dtype=np.float64) for c, v in col_data.items()},
+        }
+    )
+    df["month"] = df["month"].astype(str)
+    return df
+
+def build_metrics_kpi_duckdb(con: duckdb.DuckDBPyConnection, metrics_root: Path) -> pd.DataFrame:
+    """Experimental bulk loader (--metrics_engine duckdb).
+
+    One read_json_auto('**/<metric>.json') call per metric lets DuckDB's
+    parallel JSON reader ingest every repo's copy at once, and UNPIVOT turns
+    the month columns into (repo, month, value) rows without any Python-side
+    dict walking. The nested latency files (avg/quantile structs with a
+    quantile_2->quantile_1 fallback) don't map onto a static UNPIVOT and stay
+    on parse_metric_file.
+    """
+    long_parts: List[pd.DataFrame] = []
+
+    for fname, key in METRICS_FILE_MAP.items():
+        if key.startswith("lat_"):
+            continue
+        pattern = str(metrics_root / "**" / fname).replace("'", "''")
+        try:
+            # month values are cast to VARCHAR up front so UNPIVOT never hits
+            # mixed column types (one string-polluted cell would otherwise
+            # abort the whole metric); try_cast back to DOUBLE degrades bad
+            # cells to NULL just like the python engine's per-value float()
+            part = con.execute(f"""
+                SELECT
+                  regexp_extract(filename, '([^/\\\\]+)[/\\\\][^/\\\\]+$', 1) AS repo_name,
+                  month,
+                  try_cast(value AS DOUBLE) AS value
+                FROM (
+                  UNPIVOT (
+                    SELECT filename, CAST(COLUMNS(* EXCLUDE (filename)) AS VARCHAR)
+                    FROM read_json_auto('{pattern}', filename=true, union_by_name=true)
+                  )
+                  ON COLUMNS(* EXCLUDE (filename))
+                  INTO NAME month VALUE value
+                )
+                WHERE value IS NOT NULL
+            """).df()
+        except duckdb.Error as e:
+            # metric stays absent (e.g. no matching files), but say so: silently
+            # dropping a whole KPI column is how data loss goes unnoticed
+            print(f"[warn] duckdb metrics engine skipped {fname}: {e}")
+            continue
+        if part.empty:
+            continue
+        if fname == "stars.json":
+            delta = part[part["month"].map(_is_month)].copy()
+            delta["kpi"] = "kpi_stars_delta_month"
+            long_parts.append(delta)
+            raw = part[part["month"].str.endswith("-raw")].copy()
+            raw["month"] = raw["month"].str[:-4]
+            raw = raw[raw["month"].map(_is_month)]
+            raw["kpi"] = "kpi_stars_total"
+            long_parts.append(raw)
+        else:
+            part = part[part["month"].map(_is_month)].copy()
+            part["kpi"] = key
+            long_parts.append(part)
+
+    # latency metrics: small nested files, reuse the Python parser
+    lat_files = {f for f, k in METRICS_FILE_MAP.items() if k.startswith("lat_")}
+    lat_rows: Dict[str, List[Any]] = {"repo_name": [], "month": [], "kpi": [], "value": []}
+    for d, jsons in find_repo_dirs(metrics_root):
+        for name in jsons:
+            if name not in lat_files:
+                continue
+            for col, series in parse_metric_file(d / name).items():
+                for m, v in series.items():
+                    lat_rows["repo_name"].append(d.name)
+                    lat_rows["month"].append(m)
+                    lat_rows["kpi"].append(col)
+                    lat_rows["value"].append(v)
+    if lat_rows["repo_name"]:
+        long_parts.append(pd.DataFrame(lat_rows))
+
+    if not long_parts:
+        raise RuntimeError("No metrics parsed. Please check your top_300_metrics folder structure.")
+
+    df = (
+        pd.concat(long_parts, ignore_index=True)
+        .pivot_table(index=["repo_name", "month"], columns="kpi", values="value", aggfunc="last")
+        .reset_index()
+    )
+    df.columns.name = None
     df["month"] = df["month"].astype(str)
     return df
 
 # -----------------------------
 # Log parsing (DuckDB, streaming)
 # -----------------------------
+# The raw log carries ~50 columns; this is the subset the pipeline touches,
+# with explicit types so timestamps parse correctly at read time (no per-query
+# try_cast) and the reader never materializes the untouched columns.
+LOG_COLUMNS = {
+    "repo_name": "VARCHAR",
+    "created_at": "TIMESTAMP",
+    "type": "VARCHAR",
+    "action": "VARCHAR",
+    "push_distinct_size": "BIGINT",
+    "pull_merged": "BIGINT",
+    "pull_additions": "BIGINT",
+    "pull_deletions": "BIGINT",
+    "release_published_at": "TIMESTAMP",
+    "issue_id": "BIGINT",
+    "issue_number": "BIGINT",
+    "issue_title": "VARCHAR",
+    "issue_author_id": "BIGINT",
+    "issue_created_at": "TIMESTAMP",
+    "issue_comment_created_at": "TIMESTAMP",
+    "issue_comment_author_id": "BIGINT",
+    "pull_merged_at": "TIMESTAMP",
+    "repo_description": "VARCHAR",
+    "repo_language": "VARCHAR",
+    "repo_license": "VARCHAR",
+    "repo_created_at": "TIMESTAMP",
+}
+
 def guess_delim_from_first_line(log_file: Path) -> Optional[str]:
-    # quick heuristic: choose among tab/comma/pipe
-    with log_file.open("r", encoding="utf-8", errors="ignore") as f:
-        line = f.readline()
-    if not line:
+    # quick heuristic: choose among tab/comma/pipe. Binary mode with one small
+    # read: text-mode readline would decode (and keep reading) a potentially
+    # huge first line if the newline comes late
+    with log_file.open("rb") as f:
+        buf = f.read(65536)
+    if not buf:
         return None
-    candidates = [("\t", line.count("\t")), (",", line.count(",")), ("|", line.count("|"))]
+    nl = buf.find(b"\n")
+    line = buf[:nl] if nl >= 0 else buf
+    candidates = [("\t", line.count(b"\t")), (",", line.count(b",")), ("|", line.count(b"|"))]
     candidates.sort(key=lambda x: x[1], reverse=True)
     if candidates[0][1] == 0:
         return None
     return candidates[0][0]
 
-def build_repo_meta_from_log(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
-    # any_value is fine for description/language/license; created_at use min
+def build_repo_meta_from_log(con: duckdb.DuckDBPyConnection) -> pa.Table:
+    # any_value is fine for description/language/license; created_at use min.
+    # Fetched as Arrow: goes straight to Parquet, no pandas boxing
     return con.execute("""
         SELECT
           repo_name,
@@ -162,37 +394,29 @@ def build_repo_meta_from_log(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
           any_value(repo_language) AS repo_language,
           any_value(repo_license) AS repo_license,
           min(repo_created_at) AS repo_created_at
-        FROM log
-        WHERE repo_name IS NOT NULL
+        FROM log_base
         GROUP BY repo_name
-    """).df()
+    """).fetch_arrow_table()
 
-def build_log_monthly_agg(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+def build_log_monthly_agg(con: duckdb.DuckDBPyConnection) -> pa.Table:
+    # Arrow result: written to Parquet and re-registered with DuckDB for the
+    # final merge without ever materializing a pandas frame.
+    # SUM over BIGINT widens to HUGEINT (decimal128 in Parquet, Decimal objects
+    # downstream); cast to DOUBLE to keep the float64 schema consumers expect
     return con.execute("""
-        WITH base AS (
-          SELECT
-            repo_name,
-            strftime(created_at, '%Y-%m') AS month,
-            type, action,
-            push_distinct_size,
-            pull_merged,
-            pull_additions, pull_deletions,
-            release_published_at
-          FROM log
-          WHERE repo_name IS NOT NULL AND created_at IS NOT NULL
-        )
         SELECT
           repo_name,
-          month,
-          SUM(CASE WHEN type='Push' THEN COALESCE(push_distinct_size,0) ELSE 0 END) AS kpi_commits_month_log,
-          SUM(CASE WHEN type='Issues' AND action='opened' THEN 1 ELSE 0 END) AS kpi_new_issues_month_log,
-          SUM(CASE WHEN type='PullRequest' AND action='opened' THEN 1 ELSE 0 END) AS kpi_new_prs_month_log,
-          SUM(CASE WHEN type='Release' AND release_published_at IS NOT NULL THEN 1 ELSE 0 END) AS kpi_release_count_month_log,
-          SUM(CASE WHEN type='PullRequest' AND COALESCE(pull_merged,0)=1
-                   THEN COALESCE(pull_additions,0)+COALESCE(pull_deletions,0) ELSE 0 END) AS kpi_code_change_lines_month_log
-        FROM base
-        GROUP BY repo_name, month
-    """).df()
+          printf('%04d-%02d', month_key // 100, month_key % 100) AS month,
+          CAST(SUM(CASE WHEN type='Push' THEN COALESCE(push_distinct_size,0) ELSE 0 END) AS DOUBLE) AS kpi_commits_month_log,
+          CAST(SUM(CASE WHEN type='Issues' AND action='opened' THEN 1 ELSE 0 END) AS DOUBLE) AS kpi_new_issues_month_log,
+          CAST(SUM(CASE WHEN type='PullRequest' AND action='opened' THEN 1 ELSE 0 END) AS DOUBLE) AS kpi_new_prs_month_log,
+          CAST(SUM(CASE WHEN type='Release' AND release_published_at IS NOT NULL THEN 1 ELSE 0 END) AS DOUBLE) AS kpi_release_count_month_log,
+          CAST(SUM(CASE WHEN type='PullRequest' AND COALESCE(pull_merged,0)=1
+                   THEN COALESCE(pull_additions,0)+COALESCE(pull_deletions,0) ELSE 0 END) AS DOUBLE) AS kpi_code_change_lines_month_log
+        FROM log_base
+        WHERE month_key IS NOT NULL
+        GROUP BY repo_name, month_key
+    """).fetch_arrow_table()
 
 def build_evidence_latest_month(con: duckdb.DuckDBPyConnection, out_jsonl: Path, topk: int = 5) -> None:
     """
@@ -202,154 +426,136 @@ def build_evidence_latest_month(con: duckdb.DuckDBPyConnection, out_jsonl: Path,
 
     Notes:
       - Avoid scalar subqueries (DuckDB requires they return exactly one row).
-      - Use try_cast(...) to tolerate dirty/heterogeneous datetime strings.
-      - Month is carried by JOIN latest_tbl as t.latest_month.
+      - Timestamps are typed at read time (LOG_COLUMNS); dirty rows are dropped
+        by the reader's ignore_errors, so no per-row try_cast here.
+      - Month is carried by JOIN latest_tbl as t.latest_month_key (integer
+        yyyymm), formatted back to 'YYYY-MM' in the projection.
+      - topk per repo is computed in-engine (QUALIFY row_number), so only
+        ~topk * n_repos rows ever cross back into Python, as Arrow tables.
     """
-    import json
-    import pandas as pd
-
-    # 1) latest month per repo (deduplicated)
-    latest = con.execute("""
+    # 1) latest month per repo — stays inside DuckDB: GROUP BY repo_name
+    # already yields one row per repo and log_base filters NULL repos, so the
+    # old pandas dropna/drop_duplicates round-trip added nothing
+    con.execute("""
+        CREATE OR REPLACE TEMPORARY TABLE latest_tbl AS
         SELECT
           repo_name,
-          max(strftime(try_cast(created_at AS TIMESTAMP), '%Y-%m')) AS latest_month
-        FROM log
-        WHERE repo_name IS NOT NULL AND try_cast(created_at AS TIMESTAMP) IS NOT NULL
+          max(month_key) AS latest_month_key
+        FROM log_base
+        WHERE month_key IS NOT NULL
         GROUP BY repo_name
-    """).df()
-    latest = latest.dropna(subset=["repo_name", "latest_month"]).drop_duplicates(subset=["repo_name"])
-    con.register("latest_tbl", latest)
+    """)
 
     # -----------------------------
-    # 2) Issue slow response evidence
+    # 2) One aggregation pass for both evidence types
     # -----------------------------
+    # Issue-response and PR-merge evidence used to run as separate
+    # aggregations over the latest-month rows (three hash builds total).
+    # Conditional aggregates over one GROUP BY (repo, month, issue_id) gather
+    # everything in a single scan; the two result sets below just filter it.
+    con.execute(r"""
+      CREATE OR REPLACE TEMPORARY TABLE evidence_base AS
+      SELECT
+        l.repo_name,
+        printf('%04d-%02d', t.latest_month_key // 100, t.latest_month_key % 100) AS month,
+        l.issue_id,
+        any_value(l.issue_number) AS issue_number,
+        any_value(l.issue_title) AS issue_title,
+        min(l.issue_created_at) AS entity_created_at,
+        min(CASE WHEN l.type = 'IssueComment' AND l.issue_comment_author_id IS NOT NULL
+                 THEN l.issue_comment_created_at END) AS first_comment_at,
+        max(CASE WHEN l.type = 'PullRequest' AND COALESCE(l.pull_merged, 0) = 1
+                 THEN l.pull_merged_at END) AS pr_merged_at,
+        bool_or(l.type = 'PullRequest') AS is_pr,
+        any_value(l.pull_additions) AS pull_additions,
+        any_value(l.pull_deletions) AS pull_deletions
+      FROM log_base l
+      JOIN latest_tbl t
+        ON l.repo_name = t.repo_name
+       AND l.month_key = t.latest_month_key
+      WHERE l.issue_id IS NOT NULL
+      GROUP BY l.repo_name, t.latest_month_key, l.issue_id
+    """)
+
     issue_evd = con.execute(r"""
-      WITH issue_base AS (
-        SELECT
-          l.repo_name,
-          t.latest_month AS month,
-          l.issue_id,
-          any_value(l.issue_number) AS issue_number,
-          any_value(l.issue_title) AS issue_title,
-          any_value(l.issue_author_id) AS issue_author_id,
-          min(try_cast(l.issue_created_at AS TIMESTAMP)) AS issue_created_at
-        FROM log l
-        JOIN latest_tbl t
-          ON l.repo_name = t.repo_name
-         AND strftime(try_cast(l.created_at AS TIMESTAMP), '%Y-%m') = t.latest_month
-        WHERE l.issue_id IS NOT NULL
-          AND try_cast(l.issue_created_at AS TIMESTAMP) IS NOT NULL
-        GROUP BY l.repo_name, t.latest_month, l.issue_id
-      ),
-      first_comment AS (
-        SELECT
-          l.repo_name,
-          l.issue_id,
-          min(try_cast(l.issue_comment_created_at AS TIMESTAMP)) AS first_comment_at
-        FROM log l
-        JOIN latest_tbl t
-          ON l.repo_name = t.repo_name
-         AND strftime(try_cast(l.created_at AS TIMESTAMP), '%Y-%m') = t.latest_month
-        WHERE l.type = 'IssueComment'
-          AND l.issue_id IS NOT NULL
-          AND try_cast(l.issue_comment_created_at AS TIMESTAMP) IS NOT NULL
-          AND l.issue_comment_author_id IS NOT NULL
-        GROUP BY l.repo_name, l.issue_id
-      )
       SELECT
-        i.repo_name,
-        i.month,
-        i.issue_id,
-        i.issue_number,
-        i.issue_title,
-        i.issue_created_at,
-        c.first_comment_at,
-        date_diff('minute', i.issue_created_at, c.first_comment_at) / 60.0 AS response_hours
-      FROM issue_base i
-      JOIN first_comment c
-        ON i.repo_name = c.repo_name AND i.issue_id = c.issue_id
-      WHERE c.first_comment_at >= i.issue_created_at
+        repo_name,
+        month,
+        issue_id,
+        issue_number,
+        issue_title,
+        entity_created_at AS issue_created_at,
+        first_comment_at,
+        date_diff('minute', entity_created_at, first_comment_at) / 60.0 AS response_hours
+      FROM evidence_base
+      WHERE entity_created_at IS NOT NULL
+        AND first_comment_at IS NOT NULL
+        AND first_comment_at >= entity_created_at
+      QUALIFY row_number() OVER (PARTITION BY repo_name ORDER BY response_hours DESC) <= ?
       ORDER BY response_hours DESC
-    """).df()
+    """, [topk]).fetch_arrow_table()
 
     # -----------------------------
     # 3) PR slow merge evidence
     # -----------------------------
     pr_evd = con.execute(r"""
-      WITH pr_base AS (
-        SELECT
-          l.repo_name,
-          t.latest_month AS month,
-          l.issue_id,
-          any_value(l.issue_number) AS pr_number,
-          any_value(l.issue_title) AS pr_title,
-          min(try_cast(l.issue_created_at AS TIMESTAMP)) AS pr_created_at,
-          max(try_cast(l.pull_merged_at AS TIMESTAMP)) AS pr_merged_at,
-          any_value(l.pull_additions) AS pull_additions,
-          any_value(l.pull_deletions) AS pull_deletions
-        FROM log l
-        JOIN latest_tbl t
-          ON l.repo_name = t.repo_name
-         AND strftime(try_cast(l.created_at AS TIMESTAMP), '%Y-%m') = t.latest_month
-        WHERE l.type = 'PullRequest'
-          AND l.issue_id IS NOT NULL
-          AND try_cast(l.issue_created_at AS TIMESTAMP) IS NOT NULL
-          AND COALESCE(l.pull_merged, 0) = 1
-          AND try_cast(l.pull_merged_at AS TIMESTAMP) IS NOT NULL
-        GROUP BY l.repo_name, t.latest_month, l.issue_id
-      )
       SELECT
         repo_name,
         month,
         issue_id,
-        pr_number,
-        pr_title,
-        pr_created_at,
+        issue_number AS pr_number,
+        issue_title AS pr_title,
+        entity_created_at AS pr_created_at,
         pr_merged_at,
-        date_diff('minute', pr_created_at, pr_merged_at) / 60.0 AS merge_hours,
+        date_diff('minute', entity_created_at, pr_merged_at) / 60.0 AS merge_hours,
         COALESCE(pull_additions, 0) + COALESCE(pull_deletions, 0) AS change_lines
-      FROM pr_base
-      WHERE pr_merged_at >= pr_created_at
+      FROM evidence_base
+      WHERE is_pr
+        AND entity_created_at IS NOT NULL
+        AND pr_merged_at IS NOT NULL
+        AND pr_merged_at >= entity_created_at
+      QUALIFY row_number() OVER (PARTITION BY repo_name ORDER BY merge_hours DESC) <= ?
       ORDER BY merge_hours DESC
-    """).df()
+    """, [topk]).fetch_arrow_table()
 
     # -----------------------------
-    # 4) Write jsonl: keep topk per repo for each evidence type
+    # 4) Write jsonl: the queries above already keep only topk rows per repo
     # -----------------------------
     out_jsonl.parent.mkdir(parents=True, exist_ok=True)
-    with out_jsonl.open("w", encoding="utf-8") as f:
-        if not issue_evd.empty:
-            for repo, g in issue_evd.groupby("repo_name"):
-                for _, r in g.head(topk).iterrows():
-                    f.write(json.dumps({
-                        "repo_name": r["repo_name"],
-                        "month": r["month"],
-                        "evidence_type": "issue_slow_response",
-                        "entity_type": "issue",
-                        "issue_id": int(r["issue_id"]),
-                        "issue_number": int(r["issue_number"]) if pd.notna(r["issue_number"]) else None,
-                        "issue_title": r["issue_title"],
-                        "issue_created_at": str(r["issue_created_at"]),
-                        "first_comment_at": str(r["first_comment_at"]),
-                        "response_hours": float(r["response_hours"]),
-                    }, ensure_ascii=False) + "\n")
-
-        if not pr_evd.empty:
-            for repo, g in pr_evd.groupby("repo_name"):
-                for _, r in g.head(topk).iterrows():
-                    f.write(json.dumps({
-                        "repo_name": r["repo_name"],
-                        "month": r["month"],
-                        "evidence_type": "pr_slow_merge",
-                        "entity_type": "pull_request",
-                        "issue_id": int(r["issue_id"]),
-                        "pr_number": int(r["pr_number"]) if pd.notna(r["pr_number"]) else None,
-                        "pr_title": r["pr_title"],
-                        "pr_created_at": str(r["pr_created_at"]),
-                        "pr_merged_at": str(r["pr_merged_at"]),
-                        "merge_hours": float(r["merge_hours"]),
-                        "change_lines": int(r["change_lines"]) if pd.notna(r["change_lines"]) else None,
-                    }, ensure_ascii=False) + "\n")
+    issue_rows = [
+        {
+            "repo_name": r["repo_name"],
+            "month": r["month"],
+            "evidence_type": "issue_slow_response",
+            "entity_type": "issue",
+            "issue_id": int(r["issue_id"]),
+            "issue_number": int(r["issue_number"]) if r["issue_number"] is not None else None,
+            "issue_title": r["issue_title"],
+            "issue_created_at": str(r["issue_created_at"]),
+            "first_comment_at": str(r["first_comment_at"]),
+            "response_hours": float(r["response_hours"]),
+        }
+        for r in issue_evd.to_pylist()
+    ]
+    pr_rows = [
+        {
+            "repo_name": r["repo_name"],
+            "month": r["month"],
+            "evidence_type": "pr_slow_merge",
+            "entity_type": "pull_request",
+            "issue_id": int(r["issue_id"]),
+            "pr_number": int(r["pr_number"]) if r["pr_number"] is not None else None,
+            "pr_title": r["pr_title"],
+            "pr_created_at": str(r["pr_created_at"]),
+            "pr_merged_at": str(r["pr_merged_at"]),
+            "merge_hours": float(r["merge_hours"]),
+            "change_lines": int(r["change_lines"]) if r["change_lines"] is not None else None,
+        }
+        for r in pr_evd.to_pylist()
+    ]
+    with out_jsonl.open("wb") as f:
+        f.write(dump_jsonl(issue_rows))
+        f.write(dump_jsonl(pr_rows))
 
 # -----------------------------
 # Main pipeline
@@ -361,6 +567,8 @@ def main():
     ap.add_argument("--out_dir", type=str, required=True, help="Output folder")
     ap.add_argument("--log_delim", type=str, default=None, help="Optional: delimiter for log file, e.g. '\\t' or ','")
     ap.add_argument("--skip_evidence", action="store_true", help="Skip generating evidence jsonl")
+    ap.add_argument("--metrics_engine", choices=["python", "duckdb"], default="python",
+                    help="Metrics loader: 'python' (per-file parser) or 'duckdb' (bulk read_json_auto, experimental)")
     args = ap.parse_args()
 
     metrics_dir = Path(args.metrics_dir)
@@ -368,8 +576,24 @@ def main():
     out_dir = Path(args.out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
+    con = duckdb.connect(database=":memory:")
+
+    # tune the engine before any scans: all cores, a sane memory cap (it is a
+    # limit, not a reservation), and no insertion-order guarantee — nothing
+    # downstream relies on row order and parallel CSV/Parquet scans get much
+    # faster without it. temp_directory lets oversized operators spill to disk.
+    con.execute(f"PRAGMA threads={os.cpu_count()}")
+    con.execute("PRAGMA memory_limit='16GB'")
+    con.execute("PRAGMA preserve_insertion_order=false")
+    con.execute("PRAGMA enable_object_cache=true")
+    tmp_dir = str(out_dir / "duckdb_tmp").replace("'", "''")
+    con.execute(f"PRAGMA temp_directory='{tmp_dir}'")
+
     # 1) metrics -> partial kpi table
-    metrics_df = build_metrics_kpi(metrics_dir)
+    if args.metrics_engine == "duckdb":
+        metrics_df = build_metrics_kpi_duckdb(con, metrics_dir)
+    else:
+        metrics_df = build_metrics_kpi(metrics_dir)
 
     # 2) log -> duckdb view
     delim = args.log_delim
@@ -377,61 +601,97 @@ def main():
         delim = guess_delim_from_first_line(log_file)
 
     delim_clause = f", delim='{delim}'" if delim else ""
-    con = duckdb.connect(database=":memory:")
 
-    # Important: increase sample_size for better type inference on huge files
-    con.execute(f"""
-      CREATE VIEW log AS
-      SELECT *
+    # Pin the types of the columns we use instead of sniffing them from a
+    # million-row sample; the projected SELECT list lets DuckDB skip the
+    # remaining ~30 CSV columns entirely
+    types_sql = ", ".join(f"'{c}': '{t}'" for c, t in LOG_COLUMNS.items())
+    csv_src = f"""
+      SELECT {", ".join(LOG_COLUMNS)}
       FROM read_csv_auto(
         '{str(log_file).replace("'", "''")}',
         header=True,
-        sample_size=1000000,
+        types={{{types_sql}}},
         ignore_errors=true
         {delim_clause}
       )
+    """
+
+    # parse the text log once into a zstd Parquet cache; subsequent runs (and
+    # every query below) get columnar projection + cheap decoding instead of a
+    # full CSV re-parse. Rebuilt whenever the source log is newer.
+    log_parquet = out_dir / "log.parquet"
+    if not log_parquet.exists() or log_parquet.stat().st_mtime < log_file.stat().st_mtime:
+        con.execute(f"""
+          COPY ({csv_src}) TO '{str(log_parquet).replace("'", "''")}'
+          (FORMAT 'parquet', COMPRESSION 'zstd', ROW_GROUP_SIZE 1000000)
+        """)
+    con.execute(f"""
+      CREATE VIEW log AS
+      SELECT * FROM read_parquet('{str(log_parquet).replace("'", "''")}')
+    """)
+
+    # materialize the shared base once: the month bucket is computed a single
+    # time here instead of per-row in every query, and the three downstream
+    # builders scan this in-memory table rather than re-reading the Parquet.
+    # The bucket is an integer yyyymm key — cheaper to hash in GROUP BY/JOIN
+    # than a VARCHAR; it is formatted back to 'YYYY-MM' at final projections
+    con.execute("""
+      CREATE TABLE log_base AS
+      SELECT *, year(created_at) * 100 + month(created_at) AS month_key
+      FROM log
+      WHERE repo_name IS NOT NULL
     """)
 
     # 3) repo_meta
-    meta_df = build_repo_meta_from_log(con)
-    meta_df.to_parquet(out_dir / "repo_meta.parquet", index=False)
+    meta_tbl = build_repo_meta_from_log(con)
+    write_parquet(meta_tbl, out_dir / "repo_meta.parquet")
 
     # 4) log monthly aggregate
-    log_monthly_df = build_log_monthly_agg(con)
-    log_monthly_df.to_parquet(out_dir / "log_monthly_agg.parquet", index=False)
-
-    # 5) merge metrics + log monthly
-    kpi = pd.merge(metrics_df, log_monthly_df, on=["repo_name", "month"], how="outer")
-
-    # fill: prefer metrics if exists, else use log-derived
-    def coalesce(a, b):
-        return a.where(~a.isna(), b)
-
-    if "kpi_new_issues_month" in kpi.columns and "kpi_new_issues_month_log" in kpi.columns:
-        kpi["kpi_new_issues_month"] = coalesce(kpi["kpi_new_issues_month"], kpi["kpi_new_issues_month_log"])
-    if "kpi_new_prs_month" in kpi.columns and "kpi_new_prs_month_log" in kpi.columns:
-        kpi["kpi_new_prs_month"] = coalesce(kpi["kpi_new_prs_month"], kpi["kpi_new_prs_month_log"])
-    if "kpi_code_change_lines_month" in kpi.columns and "kpi_code_change_lines_month_log" in kpi.columns:
-        kpi["kpi_code_change_lines_month"] = coalesce(kpi["kpi_code_change_lines_month"], kpi["kpi_code_change_lines_month_log"])
-
+    log_monthly_tbl = build_log_monthly_agg(con)
+    write_parquet(log_monthly_tbl, out_dir / "log_monthly_agg.parquet")
+
+    # 5) merge metrics + log monthly in DuckDB: one parallel FULL OUTER JOIN
+    # with the metric-vs-log coalescing in the projection, written straight to
+    # Parquet — no intermediate merged DataFrame in pandas
+    con.register("metrics_tbl", metrics_df)
+    con.register("log_monthly_tbl", log_monthly_tbl)
+
+    metric_cols = [c for c in metrics_df.columns if c not in ("repo_name", "month")]
+    log_cols = [c for c in log_monthly_tbl.column_names if c not in ("repo_name", "month")]
+
+    # prefer metrics if exists, else use log-derived
+    coalesce_pairs = {
+        "kpi_new_issues_month": "kpi_new_issues_month_log",
+        "kpi_new_prs_month": "kpi_new_prs_month_log",
+        "kpi_code_change_lines_month": "kpi_code_change_lines_month_log",
+        "kpi_commits_month": "kpi_commits_month_log",
+        "kpi_release_count_month": "kpi_release_count_month_log",
+    }
+    select_parts = ["repo_name", "month"]
+    for c in metric_cols:
+        log_c = coalesce_pairs.get(c)
+        if log_c and log_c in log_cols:
+            select_parts.append(f'COALESCE(m."{c}", lm."{log_c}") AS "{c}"')
+        else:
+            select_parts.append(f'm."{c}"')
     # commits / releases are often not in metrics; use log
-    if "kpi_commits_month" not in kpi.columns:
-        kpi["kpi_commits_month"] = kpi.get("kpi_commits_month_log")
-    else:
-        kpi["kpi_commits_month"] = coalesce(kpi["kpi_commits_month"], kpi.get("kpi_commits_month_log"))
-
-    if "kpi_release_count_month" not in kpi.columns:
-        kpi["kpi_release_count_month"] = kpi.get("kpi_release_count_month_log")
-    else:
-        kpi["kpi_release_count_month"] = coalesce(kpi["kpi_release_count_month"], kpi.get("kpi_release_count_month_log"))
-
-    # drop helper columns
-    for c in [c for c in kpi.columns if c.endswith("_log")]:
-        pass  # keep them if you want debugging; otherwise drop
-    # kpi.drop(columns=[c for c in kpi.columns if c.endswith("_log")], inplace=True, errors="ignore")
+    for c in ("kpi_commits_month", "kpi_release_count_month"):
+        if c not in metric_cols and coalesce_pairs[c] in log_cols:
+            select_parts.append(f'lm."{coalesce_pairs[c]}" AS "{c}"')
+    # keep the raw *_log columns for debugging, like the old outer merge did
+    select_parts.extend(f'lm."{c}"' for c in log_cols)
 
     # 6) save main table
-    kpi.to_parquet(out_dir / "repo_month_kpi.parquet", index=False)
+    kpi_path = out_dir / "repo_month_kpi.parquet"
+    con.execute(f"""
+      COPY (
+        SELECT {", ".join(select_parts)}
+        FROM metrics_tbl m
+        FULL OUTER JOIN log_monthly_tbl lm USING (repo_name, month)
+      ) TO '{str(kpi_path).replace("'", "''")}'
+      (FORMAT 'parquet', COMPRESSION 'zstd')
+    """)
 
     # 7) evidence (optional)
     if not args.skip_evidence: